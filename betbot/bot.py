@@ -5,32 +5,47 @@ Created on Sat Jun 04 12:05:50 2016
 @author: SSundukov
 """
 
-from collections import defaultdict
 from functools import cached_property
 import os.path
-import json
 import logging
 import re
 import datetime
-import time
 import traceback
 import threading
 
 import pytz
 import tabulate
 from betbot import sources
-import schedule
 import telebot
 
 from config import config
-from . import conf, helpers, database, messages, utils, commands
+from . import (
+    conf,
+    helpers,
+    database,
+    jsonio,
+    messages,
+    notify,
+    outbox,
+    scheduler,
+    utils,
+    webhook,
+    commands,
+)
 
 telebot.logger.setLevel(logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-UPDATE_INTERVAL_SEC = 60
+# Safety-net update pass when no match timer or data change woke the bot.
+RECONCILE_INTERVAL = datetime.timedelta(minutes=5)
 REMIND_BEFORE = datetime.timedelta(minutes=30)
 REMIND_DAY_BEFORE = datetime.timedelta(hours=24)
+# Match timer kinds -> how long before kickoff they fire.
+MATCH_TIMERS = {
+    "kickoff": datetime.timedelta(0),
+    "remind": REMIND_BEFORE,
+    "remind_day": REMIND_DAY_BEFORE,
+}
 
 RESULTS_URL = config["results_url"]
 EXTRA_SCORE_MODE = config["extra_score_mode"]
@@ -42,6 +57,8 @@ PLAYOFF_TABLE_ENABLED = config.get("playoff_table_enabled", False)
 BOT_ID_ONE_ZERO = -999999999  # The 1-0 betting bot
 
 bot = telebot.TeleBot(config["token"])
+# The update job's messages go through here, so it never waits on Telegram.
+bot_outbox = outbox.Outbox(bot)
 
 
 class DbHelper:
@@ -59,7 +76,11 @@ class DbHelper:
 
     def reload_db(self):
         with self.db_lock:
-            self.db.reload_data()
+            return self.db.reload_data()
+
+    def pop_changed_matches(self):
+        with self.db_lock:
+            return self.db.pop_changed_matches()
 
     def register_player(self, pid, first_name, last_name):
         assert not self.is_registered_by_id(pid)
@@ -113,7 +134,7 @@ def make_automatic_bot_bets():
             for match in all_matches:
                 if match.id() not in existing_match_ids:
                     # Create 1-0 result (team 1 wins 1-0)
-                    result = database.Result(1, 0)
+                    result = database.Result.get(1, 0)
 
                     # Add the prediction
                     db.predictions.addPrediction(bot_player, match, result, unow)
@@ -183,9 +204,7 @@ def playoff_scores(message):
     commands=["sendLast"], func=lambda m: db_helper.is_admin(m.from_user)
 )
 def send_last(message):
-    for m in db_helper.get_db().matches.getMatchesBefore(utils.utcnow()):
-        if m.is_finished():
-            continue
+    for m in db_helper.get_db().matches.getMatchesInProgress(utils.utcnow()):
         helpers.send_match_predictions(bot, db_helper.get_db(), config, m)
 
 
@@ -491,7 +510,8 @@ def cmd_test_events(message):
 def cmd_test_events_file(message):
     """Write sample events to the shared file, then read them back and post.
 
-    Exercises the real updater -> shared file -> get_stored_events -> send path.
+    Exercises the real updater -> shared journal -> get_stored_events -> send
+    path.
     """
     db = db_helper.get_db()
     matches = list(db.matches.matches.values())
@@ -840,9 +860,9 @@ def handle_query(query):
             return on_error(utils.lineno())
         if m.group(2) != m.group(3):
             return on_error(utils.lineno())
-        result = database.Result(int(m.group(2)), int(m.group(3)), int(m.group(4)))
+        result = database.Result.get(int(m.group(2)), int(m.group(3)), int(m.group(4)))
     else:
-        result = database.Result(int(m.group(2)), int(m.group(3)))
+        result = database.Result.get(int(m.group(2)), int(m.group(3)))
 
     if not result.winner and match.is_playoff():
         keyboard = telebot.types.InlineKeyboardMarkup(row_width=1)
@@ -885,78 +905,89 @@ def handle_query(query):
 
 
 class UpdateJob:
-    MATCHES_TO_NOTIFY = None
     MATCHES_IN_PROGRESS = None
-    MATCHES_TO_REMIND = None
-    MATCHES_DAY_TO_REMIND = None
+    # Kickoffs and reminders of upcoming matches (MATCH_TIMERS).
+    SCHEDULER = None
+    EVENTS_READER = None
 
-    MATCH_PROCESSED_EVENTS = defaultdict(list)
+    def __init__(self):
+        # Matches whose fixture data changed since they were last checked for
+        # a finish; nothing else can have finished.
+        self.matches_changed = set()
 
     @classmethod
     def init_update_job(cls):
         logger.info("Init regular update job")
         db_helper.reload_db()
         db = db_helper.get_db()
+        # In-progress matches below are unfinished as of this load.
+        db_helper.pop_changed_matches()
 
         unow = utils.utcnow()
-        cls.MATCHES_TO_NOTIFY = {m.id() for m in db.matches.getMatchesAfter(unow)}
-        logger.info(f"Found matches to notify: {cls.MATCHES_TO_NOTIFY}")
         cls.MATCHES_IN_PROGRESS = {
-            m.id() for m in db.matches.getMatchesBefore(unow) if not m.is_finished()
+            m.id() for m in db.matches.getMatchesInProgress(unow)
         }
         logger.info(f"Found matches in progress: {cls.MATCHES_IN_PROGRESS}")
-        cls.MATCHES_TO_REMIND = {
-            m.id() for m in db.matches.getMatchesAfter(unow + REMIND_BEFORE)
-        }
-        logger.info(f"Found matches to remind: {cls.MATCHES_TO_REMIND}")
-        cls.MATCHES_DAY_TO_REMIND = {
-            m.id() for m in db.matches.getMatchesAfter(unow + REMIND_DAY_BEFORE)
-        }
-        logger.info(f"Found matches day to remind: {cls.MATCHES_DAY_TO_REMIND}")
-
-        # Seed already-stored events for in-progress matches WITHOUT sending
-        # them, so a (re)start never re-posts the event history from the shared
-        # file. Only events appended after this point get sent. The processed
-        # set is in-memory, so it starts empty on a fresh process. Reads the
-        # local shared file, so this costs no API calls.
-        cls.MATCH_PROCESSED_EVENTS = defaultdict(list)
-        if EVENTS_ENABLED:
-            for mid in cls.MATCHES_IN_PROGRESS:
-                cls.MATCH_PROCESSED_EVENTS[mid] = list(
-                    sources.get_stored_events(config, mid)
-                )
-            logger.info("Primed processed events for in-progress matches")
+        cls.SCHEDULER = scheduler.MatchScheduler(MATCH_TIMERS)
+        cls.SCHEDULER.plan(db.matches, unow)
+        logger.info(f"Next match timer at {cls.SCHEDULER.next_time()}")
+
+        # Posted events are recorded in the database (db.match_events), so a
+        # restarted bot posts exactly the events it hasn't yet; the reader's
+        # first read of each match returns its whole stored list to check.
+        cls.EVENTS_READER = sources.EventReader(config)
+        if EVENTS_ENABLED and helpers.seed_posted_events(
+            db,
+            cls.EVENTS_READER,
+            [db.matches.getMatch(mid) for mid in cls.MATCHES_IN_PROGRESS],
+        ):
+            logger.info("Recorded stored events of in-progress matches as posted")
+
+    def next_wakeup(self, now):
+        """When the next match timer or the reconciliation pass is due."""
+        wake_at = now + RECONCILE_INTERVAL
+        next_timer = self.SCHEDULER.next_time()
+        if next_timer is not None:
+            wake_at = min(wake_at, next_timer)
+        return wake_at
 
     def _remind_players(self, db, match, msg):
         for player_id in db.predictions.getMissingPlayers(match.id()):
             player = db.players.getPlayer(player_id)
             keyboard = telebot.types.InlineKeyboardMarkup(row_width=1)
             keyboard.add(helpers.create_match_button(match, player.tz()))
-            try:
-                bot.send_message(
-                    player_id, msg, parse_mode="Markdown", reply_markup=keyboard
-                )
-            except Exception as err:
-                logger.info(
-                    "Error sending remind message to player %s: %s", player_id, err
-                )
-                continue
+            bot_outbox.send_message(
+                player_id,
+                msg,
+                priority=outbox.REMINDERS,
+                parse_mode="Markdown",
+                reply_markup=keyboard,
+            )
 
     def _send_fixture_events(self, db, match):
         logger.info(f"Send fixture events for match {match.id()}")
-        # Read from the shared snapshot written by the single updater rather
-        # than calling the API per bot. Dedup stays in-memory per process.
-        events = sources.get_stored_events(config, match.id())
-        for ev in events:
-            if ev in self.MATCH_PROCESSED_EVENTS[match.id()]:
-                continue
-            logger.info("Send unprocessed event %s", ev)
-            self.MATCH_PROCESSED_EVENTS[match.id()].append(ev)
-            helpers.send_match_event(bot, db, config, match, ev)
+        # Read from the shared journal written by the single updater rather
+        # than calling the API per bot; the reader returns only events stored
+        # since its last read.
+        events = self.EVENTS_READER.read_new(match.id())
+        if events:
+            helpers.send_new_match_events(
+                bot_outbox.sender(outbox.EVENTS),
+                db,
+                config,
+                match,
+                events,
+                self.EVENTS_READER.current(match.id()),
+            )
 
     def _update_work(self):
         db_helper.reload_db()
         db = db_helper.get_db()
+        changed = db_helper.pop_changed_matches()
+        if changed:
+            # Kickoffs may have moved.
+            self.SCHEDULER.plan(db.matches, utils.utcnow())
+        self.matches_changed |= changed
 
         # Make automatic bets for bot players
         make_automatic_bot_bets()
@@ -964,30 +995,26 @@ class UpdateJob:
         last_update = utils.utcnow()
         results = db.predictions.genResults(last_update)
         results_fpath = conf.get_results_file(config)
-        with open(results_fpath, "w") as fp:
-            json.dump(results, fp)
+        with open(results_fpath, "wb") as fp:
+            fp.write(jsonio.dumps(results))
             logger.info(f"Results file dumped to: {results_fpath}")
 
-        for m in db.matches.getMatchesBefore(last_update):
-            mid = m.id()
-            if mid not in self.MATCHES_TO_NOTIFY:
-                continue
-            self.MATCHES_TO_NOTIFY.remove(mid)
-            self.MATCHES_IN_PROGRESS.add(mid)
-            logger.info(f"Add match {mid} in progress")
-            helpers.send_match_predictions(bot, db, config, m)
-
-        for m in db.matches.getMatchesBefore(last_update + REMIND_BEFORE):
-            if m.id() not in self.MATCHES_TO_REMIND:
-                continue
-            self.MATCHES_TO_REMIND.remove(m.id())
-            self._remind_players(db, m, messages.REMIND_MSG)
-
-        for m in db.matches.getMatchesBefore(last_update + REMIND_DAY_BEFORE):
-            if m.id() not in self.MATCHES_DAY_TO_REMIND:
+        scores_sender = bot_outbox.sender(outbox.SCORES)
+        for kind, mid in self.SCHEDULER.pop_due(last_update):
+            try:
+                m = db.matches.getMatch(mid)
+            except KeyError:
+                # Dropped from the fixtures since the timers were planned.
                 continue
-            self.MATCHES_DAY_TO_REMIND.remove(m.id())
-            self._remind_players(db, m, messages.REMIND_DAY_MSG)
+            if kind == "kickoff":
+                self.MATCHES_IN_PROGRESS.add(mid)
+                self.matches_changed.add(mid)
+                logger.info(f"Add match {mid} in progress")
+                helpers.send_match_predictions(scores_sender, db, config, m)
+            elif kind == "remind":
+                self._remind_players(db, m, messages.REMIND_MSG)
+            elif kind == "remind_day":
+                self._remind_players(db, m, messages.REMIND_DAY_MSG)
 
         finished_matches = []
         finished_playoff_matches = []
@@ -998,16 +1025,19 @@ class UpdateJob:
                     self._send_fixture_events(db, m)
                 except Exception:
                     logger.exception("Error sending fixture events")
-            if m.is_finished():
+            if mid in self.matches_changed and m.is_finished():
                 finished_matches.append(m)
                 if m.is_playoff():
                     finished_playoff_matches.append(m)
         self.MATCHES_IN_PROGRESS -= {m.id() for m in finished_matches}
+        self.matches_changed.clear()
         if finished_matches:
-            helpers.send_scores(bot, db, config, finished_matches=finished_matches)
+            helpers.send_scores(
+                scores_sender, db, config, finished_matches=finished_matches
+            )
         if PLAYOFF_TABLE_ENABLED and finished_playoff_matches:
             helpers.send_scores(
-                bot,
+                scores_sender,
                 db,
                 config,
                 finished_matches=finished_playoff_matches,
@@ -1023,15 +1053,27 @@ class UpdateJob:
             logger.error(traceback.format_exc())
 
 
-def start():
-    threading.Thread(
-        target=bot.infinity_polling, name="bot_infinity_polling", daemon=True
-    ).start()
+def start(use_webhook=False):
+    if use_webhook:
+        webhook.from_config(bot, config).start()
+        if not config["webhook"].get("update_job", True):
+            # An extra replica behind the proxy only handles inbound updates.
+            threading.Event().wait()
+    else:
+        threading.Thread(
+            target=bot.infinity_polling, name="bot_infinity_polling", daemon=True
+        ).start()
 
+    bot_outbox.start()
     UpdateJob.init_update_job()
     job = UpdateJob()
     job()
-    schedule.every(UPDATE_INTERVAL_SEC).seconds.do(job)
+    # Sleep until the next match timer, unless the updater signals new
+    # fixtures or events first; RECONCILE_INTERVAL bounds the sleep.
+    watcher = notify.ChangeWatcher(config)
     while True:
-        schedule.run_pending()
-        time.sleep(1)
+        now = utils.utcnow()
+        timeout = (job.next_wakeup(now) - now).total_seconds()
+        if watcher.wait(timeout):
+            logger.info("Shared data changed; running update job")
+        job()
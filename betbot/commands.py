@@ -1,12 +1,13 @@
 import logging
 import json
+import time
 from datetime import timedelta
 
 import dateutil.parser
 
 from config import config
 
-from . import sources, database, utils
+from . import sources, database, quota, utils
 
 
 def dump_info():
@@ -35,14 +36,28 @@ def update_events():
     sources.save_events(config)
 
 
-# Resource name (as used in config["update_intervals"]) -> updater function.
+# Resource name (as used in config["update_intervals"]) -> updater function,
+# called as updater(cfg, max_calls); max_calls is None when there's no quota.
 _RESOURCE_UPDATERS = {
     "fixtures": sources.save_fixtures,
+    "live_fixtures": sources.save_live_fixtures,
     "events": sources.save_events,
 }
+# Due resources run in this order, so a tight API budget goes to live data
+# first. Unlisted resources run last.
+RESOURCE_PRIORITY = ["events", "live_fixtures", "fixtures"]
+# Resources with nothing to fetch while no match is in play.
+LIVE_RESOURCES = {"events", "live_fixtures"}
 
 
-def update_all(cfg=config):
+def _priority(resource):
+    try:
+        return RESOURCE_PRIORITY.index(resource)
+    except ValueError:
+        return len(RESOURCE_PRIORITY)
+
+
+def update_all(cfg=config, intervals=None):
     """Single config-driven updater: refresh each resource that is due.
 
     ``cfg["update_intervals"]`` maps a resource to the minimum minutes between
@@ -51,25 +66,137 @@ def update_all(cfg=config):
     resource so each is throttled independently against a single schedule.
     Resources absent from the config (or with a falsy interval) are never
     fetched — that is how you opt a resource out.
+
+    With ``cfg["api_quota"]`` set, due resources draw from a shared
+    QuotaBudget in RESOURCE_PRIORITY order; one that finds the budget empty is
+    postponed to the next tick rather than marked as run.
+
+    ``intervals`` overrides ``cfg["update_intervals"]`` for this run; the
+    updater daemon uses it to poll faster or slower than configured.
     """
-    intervals = cfg.get("update_intervals", {}) or {}
+    if intervals is None:
+        intervals = cfg.get("update_intervals", {}) or {}
     now = utils.utcnow()
     state = sources.load_update_state(cfg)
+    budget = quota.QuotaBudget.from_config(cfg, state.get("quota"))
     changed = False
-    for resource, minutes in intervals.items():
-        updater = _RESOURCE_UPDATERS.get(resource)
-        if updater is None or not minutes:
-            logging.warning("No updater for resource %r; skipping", resource)
-            continue
-        last = state.get(resource)
-        due = (
-            last is None
-            or dateutil.parser.parse(last) + timedelta(minutes=minutes) <= now
-        )
-        if due:
+    try:
+        for resource in sorted(intervals, key=_priority):
+            minutes = intervals[resource]
+            updater = _RESOURCE_UPDATERS.get(resource)
+            if updater is None or not minutes:
+                logging.warning("No updater for resource %r; skipping", resource)
+                continue
+            last = state.get(resource)
+            due = (
+                last is None
+                or dateutil.parser.parse(last) + timedelta(minutes=minutes) <= now
+            )
+            if not due:
+                continue
+            max_calls = None if budget is None else budget.available(now)
+            if max_calls == 0:
+                logging.warning(
+                    "API quota exhausted (%s); postponing %s", budget, resource
+                )
+                continue
             logging.info("Updating %s", resource)
-            updater(cfg)
+            calls = sources.API_STATS.total_calls()
+            try:
+                updater(cfg, max_calls)
+            finally:
+                if budget is not None:
+                    budget.spend(sources.API_STATS.total_calls() - calls, now)
+                    state["quota"] = budget.to_state()
+                    changed = True
             state[resource] = now.isoformat()
             changed = True
-    if changed:
-        sources.save_update_state(cfg, state)
+    finally:
+        if budget is not None:
+            logging.info("API quota: %s", budget)
+        if changed:
+            sources.save_update_state(cfg, state)
+
+
+# A match is expected to end this long after kickoff: 90' plus half time and
+# stoppage. Around then the daemon polls live data every BURST_MINUTES to
+# catch the final whistle, from FINISH_LEAD before until the match is marked finished.
+MATCH_EXPECTED_END = timedelta(minutes=112)
+FINISH_LEAD = timedelta(minutes=10)
+BURST_MINUTES = 1
+# Between matches fixtures are refreshed at most this often, and the daemon
+# sleeps until the next kickoff but no longer than IDLE_WAKEUP.
+IDLE_FIXTURES_MINUTES = 180
+IDLE_WAKEUP = timedelta(hours=1)
+
+
+def plan_updates(cfg, now):
+    """Update intervals for a daemon run at ``now`` and when to wake next.
+
+    Returns ``(intervals, wake_at)``. With a match in MATCH_EVENT_WINDOW the
+    configured intervals apply, LIVE_RESOURCES (or fixtures, when live_fixtures
+    isn't configured) tightened to BURST_MINUTES once a match nears its
+    expected end; with none, LIVE_RESOURCES are skipped and fixtures
+    refreshed rarely until the next kickoff.
+    """
+    configured = cfg.get("update_intervals", {}) or {}
+    schedule = sources.load_schedule(cfg)
+    live = [
+        start
+        for start, finished in schedule
+        if not finished and start <= now <= start + sources.MATCH_EVENT_WINDOW
+    ]
+    if any(now >= start + MATCH_EXPECTED_END - FINISH_LEAD for start in live):
+        intervals = {r: minutes for r, minutes in configured.items() if minutes}
+        burst = set(LIVE_RESOURCES)
+        if "live_fixtures" not in intervals:
+            # Without the live feed the final score only comes with fixtures.
+            burst.add("fixtures")
+        for resource in burst & intervals.keys():
+            intervals[resource] = min(intervals[resource], BURST_MINUTES)
+        return intervals, now + timedelta(minutes=BURST_MINUTES)
+    if live:
+        intervals = {r: minutes for r, minutes in configured.items() if minutes}
+        step = min(intervals.values(), default=BURST_MINUTES)
+        wake_at = now + timedelta(minutes=step)
+        # Wake for the burst even if the regular step would overshoot it.
+        burst_at = min(start + MATCH_EXPECTED_END - FINISH_LEAD for start in live)
+        return intervals, min(wake_at, burst_at)
+    intervals = {
+        resource: max(minutes, IDLE_FIXTURES_MINUTES)
+        for resource, minutes in configured.items()
+        if minutes and resource not in LIVE_RESOURCES
+    }
+    wake_at = now + IDLE_WAKEUP
+    upcoming = [start for start, finished in schedule if start > now and not finished]
+    if upcoming:
+        wake_at = min(wake_at, upcoming[0])
+    return intervals, wake_at
+
+
+def run_updater_daemon(cfg=config):
+    """Run update_all forever, waking as plan_updates decides."""
+    logging.info("Starting updater daemon")
+    while True:
+        intervals, _ = plan_updates(cfg, utils.utcnow())
+        try:
+            update_all(cfg, intervals)
+        except Exception:
+            logging.exception("Update failed")
+        # Plan again: the update may have changed the fixtures.
+        now = utils.utcnow()
+        _, wake_at = plan_updates(cfg, now)
+        logging.info("Next update at %s", wake_at.isoformat())
+        time.sleep(max((wake_at - now).total_seconds(), 1))
+
+
+def quota_status(cfg=config):
+    """Print the API budget left, as the next update_all would see it."""
+    budget = quota.QuotaBudget.from_config(
+        cfg, sources.load_update_state(cfg).get("quota")
+    )
+    if budget is None:
+        print("No api_quota configured")
+        return
+    budget.available(utils.utcnow())
+    print(budget)
@@ -11,10 +11,10 @@ def get_shared_dir(config):
     return config.get("shared_dir", config["data_dir"])
 
 
-def get_data_file(config, resource):
+def get_data_file(config, resource, ext="json"):
     lid = config["league_id"]
     season = config.get("season", "no")
-    return os.path.join(get_shared_dir(config), f"{resource}-{lid}-{season}.json")
+    return os.path.join(get_shared_dir(config), f"{resource}-{lid}-{season}.{ext}")
 
 
 def _make_group_name(config):
@@ -1,8 +1,11 @@
+import bisect
+import functools
 import logging
 from datetime import datetime, timedelta
 import re
 import sqlite3
-from collections import defaultdict
+import threading
+from collections import Counter, defaultdict
 
 import pytz
 import dateutil.parser
@@ -11,6 +14,7 @@ from config import config as global_config
 from .sqlite_context import dbopen
 from . import sources
 from . import conf
+from . import schema
 
 logger = logging.getLogger(__name__)
 
@@ -52,21 +56,56 @@ class Database(object):
     def __init__(self, config):
         self.config = config
         self._db_path = conf.get_db_file(self.config)
-        self.reload_data()
+        schema.migrate(self._db_path)
+        self._fixtures_state = sources.fixtures_state(self.config)
+        self._changed_matches = set()
+        self.matches = None
+        self.reload_fixtures()
+        self.players = Players(self._db_path, self.config["admin_id"])
+        self.pending_requests = PendingRequests(self._db_path)
+        self.match_events = MatchEvents(self._db_path)
+        self.predictions = Predictions(self._db_path, self.players, self.matches)
 
     def reload_data(self):
-        self.reload_fixtures()
-        self.reload_tables()
+        """Refresh fixtures; the table objects are built once and kept."""
+        changed = self.reload_fixtures()
+        self.predictions.matches = self.matches
+        return changed
 
     def reload_fixtures(self):
-        matches_data = sources.load_fixtures(self.config)
-        self.teams = Teams(matches_data)
-        self.matches = Matches(matches_data, self.teams)
+        """Apply changed fixtures files; returns the changed match ids."""
+        if not self._fixtures_state.changed():
+            return set()
+        try:
+            matches_data = sources.load_fixtures_snapshot(
+                self.config, self._fixtures_state.digest
+            )
+            if matches_data is None:
+                matches_data = sources.load_fixtures(self.config)
+        except Exception:
+            # Retry the parse next time even if the file stays as it is.
+            self._fixtures_state.reset()
+            raise
+        if self.matches is None:
+            self.matches = Matches(matches_data, Teams(matches_data))
+            changed = set(self.matches.matches)
+        else:
+            teams = Teams(matches_data, self.teams)
+            changed = self.matches.apply(matches_data, teams)
+        if changed:
+            logger.info("Fixtures changed for matches %s", sorted(changed))
+        self._changed_matches |= changed
+        return changed
 
-    def reload_tables(self):
-        self.players = Players(self._db_path, self.config["admin_id"])
-        self.pending_requests = PendingRequests(self._db_path)
-        self.predictions = Predictions(self._db_path, self.players, self.matches)
+    @property
+    def teams(self):
+        """The teams the current matches were built with."""
+        return None if self.matches is None else self.matches.teams
+
+    def pop_changed_matches(self):
+        """Ids of matches any reload changed since the previous call."""
+        changed, self._changed_matches = self._changed_matches, set()
+        return changed
 
 
 class Team(object):
@@ -91,6 +130,13 @@ class Team(object):
         self._short_name = short_name
         self._flag = flag
 
+    def same_as(self, other):
+        return (self._name, self._short_name, self._flag) == (
+            other._name,
+            other._short_name,
+            other._flag,
+        )
+
     def id(self):
         return self._id
 
@@ -127,11 +173,20 @@ class Teams(object):
         #     return team_label
         # return '%s_%s' % (match_type, team_label)
 
-    def __init__(self, matches_data):
-        self.teams = dict()
+    def __init__(self, matches_data, previous=None):
+        """Reuses the unchanged teams of ``previous``; ``changed`` holds the ids
+        of the real teams that are new or differ from it."""
+        known_teams = previous.teams if previous is not None else {}
+        teams = dict()
+        changed = set()
         for team_info in matches_data["teams"]:
             team = Team.make_real(team_info)
-            self.teams[team.id()] = team
+            known = known_teams.get(team.id())
+            if known is not None and known.same_as(team):
+                team = known
+            else:
+                changed.add(team.id())
+            teams[team.id()] = team
 
         # for group, group_info in matches_data['groups'].items():
         #     w, r = group_info['winner'], group_info['runnerup']
@@ -154,13 +209,15 @@ class Teams(object):
                 # id = Teams.get_team_id(match_type, team_label)
                 # if id not in self.teams:
                 #     self.teams[id] = Team.make_fake(id, match_type, str(team_label))
-                match_teams[team_type] = self.teams[team_id]
+                match_teams[team_type] = teams[team_id]
             if match_info["finished"]:
                 assert match_info["winner"] in {"home", "away"}
                 win = match_teams[match_info["winner"]]
                 lose = match_teams["home" if match_info["winner"] == "away" else "away"]
-                self.teams[Teams.get_team_id("winner", match_info["name"])] = win
-                self.teams[Teams.get_team_id("loser", match_info["name"])] = lose
+                teams[Teams.get_team_id("winner", match_info["name"])] = win
+                teams[Teams.get_team_id("loser", match_info["name"])] = lose
+        self.teams = teams
+        self.changed = changed
 
     def get_participants(self, match_info):
         return [
@@ -176,17 +233,55 @@ class Teams(object):
 
 
 class Result(object):
+    """Immutable score of a match or a bet; Result.get shares instances."""
+
+    __slots__ = ("goals1", "goals2", "winner", "code")
+
+    @staticmethod
+    def get_winner(goals1, goals2):
+        return 0 if goals1 == goals2 else (1 if goals1 > goals2 else 2)
+
+    @classmethod
+    def get(cls, goals1, goals2, winner=None):
+        if winner is None:
+            winner = cls.get_winner(goals1, goals2)
+        result = INTERNED_RESULTS.get((goals1, goals2, winner))
+        if result is None:
+            result = cls(goals1, goals2, winner)
+        return result
+
     def __init__(self, goals1, goals2, winner=None):
-        self.goals1 = goals1
-        self.goals2 = goals2
         if winner is None:
-            self.winner = 0 if goals1 == goals2 else (1 if goals1 > goals2 else 2)
-        else:
-            self.winner = winner
-        assert (self.goals1 <= self.goals2 or self.winner == 1) and (
-            self.goals1 >= self.goals2 or self.winner == 2
+            winner = self.get_winner(goals1, goals2)
+        assert is_valid_result(goals1, goals2, winner)
+        set_attr = super().__setattr__
+        set_attr("goals1", goals1)
+        set_attr("goals2", goals2)
+        set_attr("winner", winner)
+        # Only bets (0-9 goals a side) have a code; match scores may not.
+        code = None
+        if goals1 < 10 and goals2 < 10:
+            code = result_code(goals1, goals2, winner)
+        set_attr("code", code)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Result is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, Result):
+            return NotImplemented
+        return (self.goals1, self.goals2, self.winner) == (
+            other.goals1,
+            other.goals2,
+            other.winner,
         )
 
+    def __hash__(self):
+        return hash((self.goals1, self.goals2, self.winner))
+
+    def __reduce__(self):
+        return (Result, (self.goals1, self.goals2, self.winner))
+
     def goals(self, index):
         return (self.goals1, self.goals2)[index]
 
@@ -246,52 +341,179 @@ class Result(object):
         )
 
     def fsnorm_winner_score(self, prediction, players_predictions):
-        set_predictions = [p for p in players_predictions if p is not None]
-        total_winner = [int(self.is_winner_score(p)) for p in set_predictions]
-        try:
-            return len(total_winner) / sum(total_winner)
-        except ZeroDivisionError:
-            return 0
+        return FsnormContext.of(players_predictions).winner_share(self)
 
     def fsnorm_exact_score(self, prediction, players_predictions):
-        set_predictions = [p for p in players_predictions if p is not None]
-        total_exact = [int(self.is_exact_score(p)) for p in set_predictions]
-        try:
-            return len(total_exact) / sum(total_exact)
-        except ZeroDivisionError:
-            return 0
+        return FsnormContext.of(players_predictions).exact_share(self)
 
     def fsnorm_score(self, prediction, players_predictions):
         score = 0
         if prediction is None:
             return score
 
-        non_zero_predictions = [p for p in players_predictions if p is not None]
+        context = FsnormContext.of(players_predictions)
 
         if self.is_winner_score(prediction):
-            score += self.fsnorm_winner_score(prediction, non_zero_predictions)
+            score += context.winner_share(self)
 
         if self.is_exact_score(prediction):
-            score += self.fsnorm_exact_score(prediction, non_zero_predictions)
+            score += context.exact_share(self)
         return round(score, 2)
 
     def __str__(self):
         return "%d - %d (%d)" % (self.goals1, self.goals2, self.winner)
 
 
+class FsnormContext(object):
+    """Bet counts by winner and exact score of one match, for fsnorm shares."""
+
+    def __init__(self, players_predictions):
+        bets = [p for p in players_predictions if p is not None]
+        self.total = len(bets)
+        self.winners = Counter(p.winner for p in bets)
+        self.exacts = Counter((p.goals1, p.goals2) for p in bets)
+
+    @classmethod
+    def of(cls, players_predictions):
+        if isinstance(players_predictions, cls):
+            return players_predictions
+        return cls(players_predictions)
+
+    @classmethod
+    def from_counts(cls, counts):
+        """Build from ``(result, number of bets)`` pairs, e.g. a GROUP BY."""
+        context = cls(())
+        for result, bets in counts:
+            context.total += bets
+            context.winners[result.winner] += bets
+            context.exacts[(result.goals1, result.goals2)] += bets
+        return context
+
+    def winner_share(self, result):
+        hits = self.winners[result.winner]
+        return self.total / hits if hits else 0
+
+    def exact_share(self, result):
+        hits = self.exacts[(result.goals1, result.goals2)]
+        return self.total / hits if hits else 0
+
+
+def is_valid_result(goals1, goals2, winner):
+    return (goals1 <= goals2 or winner == 1) and (goals1 >= goals2 or winner == 2)
+
+
+# Bets are 0-9 goals a side plus a winner, so each fits a small integer code.
+PREDICTION_CODES = 10 * 10 * 3
+
+
+def result_code(goals1, goals2, winner):
+    return (goals1 * 10 + goals2) * 3 + winner
+
+
+# Every possible bet, keyed by (goals1, goals2, winner) ...
+INTERNED_RESULTS = {
+    (g1, g2, w): Result(g1, g2, w)
+    for g1 in range(10)
+    for g2 in range(10)
+    for w in range(3)
+    if is_valid_result(g1, g2, w)
+}
+# ... and by the text the result column stores, as sqlite3 hands it over.
+STORED_RESULTS = {str(r).encode(): r for r in INTERNED_RESULTS.values()}
+STORED_RESULTS.update({key.decode(): r for key, r in STORED_RESULTS.items()})
+
+
+@functools.lru_cache(maxsize=None)
+def _hits_row(goals1, goals2, winner):
+    """Lookup table: bet code -> (winner, difference, exact, extra) hits."""
+    result = Result.get(goals1, goals2, winner)
+    row = [None] * PREDICTION_CODES
+    for p in INTERNED_RESULTS.values():
+        row[p.code] = _hits(result, p)
+    return row
+
+
+def _hits(result, p):
+    return (
+        result.is_winner_score(p),
+        result.is_difference_score(p),
+        result.is_exact_score(p),
+        result.is_extra_score(p),
+    )
+
+
+NO_HITS = (False, False, False, False)
+
+
+def _bet_hits(result, row, p):
+    if p is None:
+        return NO_HITS
+    if p.code is None:
+        return _hits(result, p)
+    return row[p.code]
+
+
+def lookup_scores(results, predictions):
+    """(scores, hits) of players' bets (rows) on finished matches (columns)."""
+    rows = [_hits_row(r.goals1, r.goals2, r.winner) for r in results]
+    hits = [
+        [
+            _bet_hits(result, row, p)
+            for result, row, p in zip(results, rows, player_predictions)
+        ]
+        for player_predictions in predictions
+    ]
+    if SCORE_MODE != "fsnorm":
+        scores = [
+            [
+                int(winner) + int(difference) + int(exact) + int(extra)
+                for winner, difference, exact, extra in player_hits
+            ]
+            for player_hits in hits
+        ]
+        return scores, hits
+    shares = []
+    for col, result in enumerate(results):
+        context = FsnormContext(
+            player_predictions[col] for player_predictions in predictions
+        )
+        shares.append((context.winner_share(result), context.exact_share(result)))
+    scores = []
+    for player_predictions, player_hits in zip(predictions, hits):
+        player_scores = []
+        for p, (winner, _, exact, _), (winner_share, exact_share) in zip(
+            player_predictions, player_hits, shares
+        ):
+            score = 0
+            if p is not None:
+                if winner:
+                    score += winner_share
+                if exact:
+                    score += exact_share
+                score = round(score, 2)
+            player_scores.append(score)
+        scores.append(player_scores)
+    return scores, hits
+
+
 def adapt_result(result):
     return str(result)
 
 
 def convert_result(s):
-    if not isinstance(s, str):
-        s = s.decode()
-    m = re.match(r"^([0-9]) - ([0-9]) \(([012])\)$", s)
-    if m is None:
-        return None
-    return Result(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    return STORED_RESULTS.get(s)
+
+
+def stored_result(goals1, goals2, winner, legacy=None):
+    """Result of a predictions row: the integer columns, else the legacy text."""
+    if goals1 is None:
+        return legacy
+    return Result.get(goals1, goals2, winner)
 
 
+# Selects the columns stored_result() takes, in order.
+RESULT_COLUMNS = "goals1, goals2, winner, result"
+
 sqlite3.register_adapter(Result, adapt_result)
 sqlite3.register_converter("result", convert_result)
 
@@ -321,12 +543,12 @@ class Match(object):
         if h is None or a is None:
             return None
         if "winner" not in match_info or match_info["winner"] is None:
-            return Result(h, a)
+            return Result.get(h, a)
         if EXTRA_SCORE_MODE == "extratime":
             home, away = cls.get_fulltime_result(match_info)
         else:
             home, away = h, a
-        return Result(
+        return Result.get(
             home,
             away,
             {
@@ -347,16 +569,34 @@ class Match(object):
 
     def __init__(self, round, match_info, teams):
         self._id = match_info["name"]
+        self._info = match_info
         self._round = round
         self._teams = teams.get_participants(match_info)
-        self._start_time = dateutil.parser.parse(match_info["date"]).astimezone(
-            pytz.utc
-        )
+        if "start_ts" in match_info:
+            # Pre-parsed by the fixtures snapshot.
+            self._start_time = datetime.fromtimestamp(match_info["start_ts"], pytz.utc)
+        else:
+            self._start_time = dateutil.parser.parse(match_info["date"]).astimezone(
+                pytz.utc
+            )
         self._is_playoff = match_info["is_playoff"]
         self._is_finished = match_info["finished"]
         self._result = self.parse_result(match_info)
         assert not self._is_finished or self._result is not None
 
+    def same_as(self, round, match_info):
+        """Whether ``match_info`` in ``round`` is the fixture this was built from."""
+        return round == self._round and self._fixture(match_info) == self._fixture()
+
+    def _fixture(self, match_info=None):
+        # The snapshot's pre-parsed kickoff duplicates "date"; leave it out so
+        # JSON and snapshot loads of the same fixture compare equal.
+        if match_info is None:
+            match_info = self._info
+        if "start_ts" not in match_info:
+            return match_info
+        return {k: v for k, v in match_info.items() if k != "start_ts"}
+
     def id(self):
         return self._id
 
@@ -418,33 +658,120 @@ class Match(object):
         return res
 
 
+class Timeline(object):
+    """Matches in Matches.order_key order, sliced by kickoff with bisect."""
+
+    def __init__(self, ordered):
+        self.ordered = ordered
+        self.times = [m.start_time() for m in ordered]
+
+    def before(self, time):
+        """Matches starting at or before ``time``."""
+        return self.ordered[: bisect.bisect_right(self.times, time)]
+
+    def after(self, time, time_top=None):
+        """Matches starting after ``time`` (and before ``time_top``, if given)."""
+        lo = bisect.bisect_right(self.times, time)
+        if time_top is None:
+            return self.ordered[lo:]
+        hi = bisect.bisect_left(self.times, time_top)
+        return self.ordered[lo:hi]
+
+
+class MatchIndex(object):
+    """One immutable state of Matches: the matches by id, the teams they were
+    built with and lookup tables in Matches.order_key order."""
+
+    def __init__(self, matches, teams):
+        self.matches = {m.id(): m for m in matches}
+        ordered = sorted(self.matches.values(), key=Matches.order_key)
+        self.teams = teams
+        self.all = Timeline(ordered)
+        self.playoff = Timeline([m for m in ordered if m.is_playoff()])
+        self.unfinished = Timeline([m for m in ordered if not m.is_finished()])
+        self.finished = [m for m in ordered if m.is_finished()]
+        self.by_round = defaultdict(list)
+        self.by_team = defaultdict(list)
+        for m in ordered:
+            self.by_round[m.round()].append(m)
+            for team_id in {m.team(0).id(), m.team(1).id()}:
+                self.by_team[team_id].append(m)
+
+
 class Matches(object):
     def __init__(self, matches_data, teams):
-        self.matches = dict()
+        self._index = MatchIndex(
+            (Match(round, info, teams) for round, info in iter_matches(matches_data)),
+            teams,
+        )
+
+    @property
+    def matches(self):
+        return self._index.matches
+
+    @property
+    def teams(self):
+        return self._index.teams
+
+    @staticmethod
+    def order_key(match):
+        return (match.start_time(), not match.is_finished(), match.id())
+
+    def apply(self, matches_data, teams):
+        """Swap in rebuilt changed matches and ``teams`` with one assignment;
+        returns the changed match ids."""
+        known_matches = self.matches
+        matches = dict()
+        changed = set()
         for round, match_info in iter_matches(matches_data):
-            match = Match(round, match_info, teams)
-            self.matches[match.id()] = match
+            mid = match_info["name"]
+            match = known_matches.get(mid)
+            if (
+                match is None
+                or not match.same_as(round, match_info)
+                or {match.team(0).id(), match.team(1).id()} & teams.changed
+            ):
+                match = Match(round, match_info, teams)
+                changed.add(mid)
+            matches[mid] = match
+        changed |= set(known_matches) - set(matches)
+        if changed or teams.changed:
+            self._index = MatchIndex(matches.values(), teams)
+        return changed
 
     def getMatchesAfter(self, time, days_limit=None):
         if days_limit:
             time_top = time + timedelta(days=days_limit)
         else:
             time_top = None
-        return sorted(
-            [
-                m
-                for m in self.matches.values()
-                if m.start_time() > time
-                and (time_top is None or m.start_time() < time_top)
-            ],
-            key=lambda m: (m.start_time(), not m.is_finished(), m.id()),
-        )
+        return self._index.all.after(time, time_top)
 
     def getMatchesBefore(self, time):
-        return sorted(
-            [m for m in self.matches.values() if m.start_time() <= time],
-            key=lambda m: (m.start_time(), not m.is_finished(), m.id()),
-        )
+        return self._index.all.before(time)
+
+    def getPlayoffMatchesBefore(self, time):
+        return self._index.playoff.before(time)
+
+    def getMatchesInProgress(self, now):
+        """Started matches that aren't finished yet."""
+        return self._index.unfinished.before(now)
+
+    def getScheduledMatches(self, now):
+        """Matches that haven't started and aren't finished."""
+        return self._index.unfinished.after(now)
+
+    def getFinishedMatches(self):
+        return list(self._index.finished)
+
+    def getRounds(self):
+        """Round names, ordered by each round's first kickoff."""
+        return list(self._index.by_round)
+
+    def getMatchesInRound(self, round):
+        return list(self._index.by_round.get(round, ()))
+
+    def getMatchesForTeam(self, team_id):
+        return list(self._index.by_team.get(team_id, ()))
 
     def getMatch(self, match_id):
         return self.matches[match_id]
@@ -513,6 +840,7 @@ class Player(object):
 class DbTable:
     def __init__(self, db_path):
         self.db_path = db_path
+        schema.migrate(db_path)
 
     def db(self):
         return dbopen(self.db_path)
@@ -522,19 +850,6 @@ class Players(DbTable):
     def __init__(self, db_path, admin_id):
         super().__init__(db_path)
         self.admin_id = admin_id
-        with self.db() as db:
-            db.execute(
-                """CREATE TABLE IF NOT EXISTS players
-                    (id integer, first_name text, last_name text, display_name text,
-                     is_queen integer not null default 1, timezone text, is_bot integer not null default 0)"""
-            )
-            # Add is_bot column if it doesn't exist (for existing databases)
-            try:
-                db.execute(
-                    "ALTER TABLE players ADD COLUMN is_bot integer not null default 0"
-                )
-            except sqlite3.OperationalError:
-                pass  # Column already exists
 
     def getPlayer(self, pid):
         with self.db() as db:
@@ -663,12 +978,6 @@ class PendingRequest(object):
 class PendingRequests(DbTable):
     def __init__(self, db_path):
         super().__init__(db_path)
-        with self.db() as db:
-            db.execute(
-                """CREATE TABLE IF NOT EXISTS pending_requests
-                    (id integer PRIMARY KEY, first_name text, last_name text,
-                     username text, requested_at text not null)"""
-            )
 
     def addRequest(self, user, requested_at):
         with self.db() as db:
@@ -717,47 +1026,283 @@ class PendingRequests(DbTable):
             db.execute("""DELETE FROM pending_requests WHERE id=?""", (uid,))
 
 
+class MatchEvents(DbTable):
+    """Events already posted per match, as {helpers.event_key: slot}."""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self._events = {}
+        self._slots = {}  # match id -> {slot: set of keys}
+
+    def isEmpty(self):
+        with self.db() as db:
+            return db.execute("SELECT 1 FROM match_events LIMIT 1").fetchone() is None
+
+    def getEvents(self, match_id):
+        events = self._events.get(match_id)
+        if events is None:
+            with self.db() as db:
+                events = dict(
+                    db.execute(
+                        "SELECT event_key, slot FROM match_events WHERE match_id=?",
+                        (match_id,),
+                    )
+                )
+            slots = defaultdict(set)
+            for key, slot in events.items():
+                slots[slot].add(key)
+            self._events[match_id] = events
+            self._slots[match_id] = slots
+        return events
+
+    def getSlotKeys(self, match_id, slot):
+        """Keys of the posted events in ``slot``."""
+        self.getEvents(match_id)
+        return self._slots[match_id].get(slot, set())
+
+    def _remember(self, match_id, key, slot):
+        self.getEvents(match_id)[key] = slot
+        self._slots[match_id][slot].add(key)
+
+    def addEvents(self, match_id, items):
+        """Record (key, slot) pairs as posted."""
+        items = list(items)
+        with self.db() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO match_events VALUES (?,?,?)",
+                [(match_id, key, slot) for key, slot in items],
+            )
+        for key, slot in items:
+            self._remember(match_id, key, slot)
+
+    def addEvent(self, match_id, key, slot):
+        self.addEvents(match_id, [(key, slot)])
+
+    def replaceEvent(self, match_id, old_key, key, slot):
+        """Record an edit of a posted event, which gets a new key."""
+        with self.db() as db:
+            db.execute(
+                "DELETE FROM match_events WHERE match_id=? AND event_key=?",
+                (match_id, old_key),
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO match_events VALUES (?,?,?)",
+                (match_id, key, slot),
+            )
+        old_slot = self.getEvents(match_id).pop(old_key, None)
+        if old_slot is not None:
+            self._slots[match_id][old_slot].discard(old_key)
+        self._remember(match_id, key, slot)
+
+
+class Standings(object):
+    """Scored bets of started matches plus per-player running totals.
+
+    Scores are kept in hundredths to stay exact for fractional fsnorm points.
+    """
+
+    class Entry(object):
+        def __init__(self, signature, is_playoff):
+            self.signature = signature
+            self.is_playoff = is_playoff
+            self.infos = {}
+            self.verbose_infos = {}
+            # player id -> (score in hundredths, is exact, is fractional)
+            self.points = {}
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self._players = None
+        self._entries = {}
+        self._totals = defaultdict(lambda: [0, 0, 0])
+        self._playoff_totals = defaultdict(lambda: [0, 0, 0])
+
+    @staticmethod
+    def signature(bet_versions, match):
+        result = match.result()
+        return (
+            None if result is None else str(result),
+            match.is_finished(),
+            bet_versions.get(int(match.id()), 0),
+        )
+
+    def refresh(self, predictions, players, matches):
+        """Rescore those of ``matches`` whose result or bets changed."""
+        player_ids = frozenset(p.id() for p in players)
+        if player_ids != self._players:
+            self.clear()
+            self._players = player_ids
+        known = predictions.matches.matches
+        for mid in [mid for mid in self._entries if mid not in known]:
+            self._drop(mid)
+        # Signatures are taken before the bets are read: a bet added meanwhile
+        # bumps the version, so the entry is rescored on the next refresh.
+        bet_versions = predictions.getBetVersions()
+        signatures = {m.id(): self.signature(bet_versions, m) for m in matches}
+        stale = [
+            m
+            for m in matches
+            if m.id() not in self._entries
+            or self._entries[m.id()].signature != signatures[m.id()]
+        ]
+        if not stale:
+            return
+        logger.info("Rescoring matches %s", [m.id() for m in stale])
+        bets = predictions.getForMatches([m.id() for m in stale])
+        finished = [m for m in stale if m.is_finished()]
+        scores, hits = lookup_scores(
+            [m.result() for m in finished],
+            [
+                [bets[int(m.id())].get(player.id()) for m in finished]
+                for player in players
+            ],
+        )
+        scored = {
+            m.id(): {
+                player.id(): (scores[row][col], hits[row][col])
+                for row, player in enumerate(players)
+            }
+            for col, m in enumerate(finished)
+        }
+        for match in stale:
+            self._drop(match.id())
+            self._score(
+                signatures[match.id()],
+                players,
+                match,
+                bets[int(match.id())],
+                scored.get(match.id()),
+            )
+
+    def _score(self, signature, players, match, bets, scored):
+        entry = self.Entry(signature, match.is_playoff())
+        match_id = int(match.id())
+        for player in players:
+            p = bets.get(player.id())
+            info = {
+                "match_id": match_id,
+                "result": None if p is None else p.label(),
+                "score": None,
+                "is_exact_score": None,
+            }
+            entry.infos[player.id()] = info
+            if scored is None:
+                continue
+            score, (is_winner, is_difference, is_exact, is_extra) = scored[player.id()]
+            info["score"] = score
+            info["is_exact_score"] = is_exact if score else None
+            entry.verbose_infos[player.id()] = dict(
+                info,
+                is_winner_score=is_winner,
+                is_difference_score=is_difference,
+                is_extra_score=is_extra,
+            )
+            entry.points[player.id()] = (
+                round(score * 100),
+                1 if info["is_exact_score"] else 0,
+                1 if isinstance(score, float) else 0,
+            )
+        self._entries[match.id()] = entry
+        self._add(entry, 1)
+
+    def _drop(self, match_id):
+        entry = self._entries.pop(match_id, None)
+        if entry is not None:
+            self._add(entry, -1)
+
+    def _add(self, entry, sign):
+        all_totals = [self._totals]
+        if entry.is_playoff:
+            all_totals.append(self._playoff_totals)
+        for totals in all_totals:
+            for pid, points in entry.points.items():
+                total = totals[pid]
+                for idx, value in enumerate(points):
+                    total[idx] += sign * value
+
+    def predictions(self, match_id, verbose=False):
+        """Per-player prediction infos of a refreshed match."""
+        entry = self._entries[match_id]
+        if verbose and entry.verbose_infos:
+            return entry.verbose_infos
+        return entry.infos
+
+    def totals(self, match_ids, is_playoff=False):
+        """Map player id -> (score, exact_score) over refreshed ``match_ids``."""
+        totals = self._playoff_totals if is_playoff else self._totals
+        totals = {pid: list(total) for pid, total in totals.items()}
+        # Running totals cover every scored match; take out the ones not asked for.
+        for mid, entry in self._entries.items():
+            if mid in match_ids or (is_playoff and not entry.is_playoff):
+                continue
+            for pid, points in entry.points.items():
+                total = totals[pid]
+                for idx, value in enumerate(points):
+                    total[idx] -= value
+        result = {}
+        for pid in self._players:
+            units, exact, fractional = totals.get(pid, (0, 0, 0))
+            score = round(units / 100, 2) if fractional else units // 100
+            result[pid] = (score, exact)
+        return result
+
+
 class Predictions(DbTable):
     def __init__(self, db_path, players, matches):
         super().__init__(db_path)
         self.players = players
         self.matches = matches
+        self.standings = Standings()
+        # ((connection, data_version, total_changes), {match id: bet version})
+        self._bet_versions = None
+
+    def addPrediction(self, player, match, result, time):
         with self.db() as db:
             db.execute(
-                """CREATE TABLE IF NOT EXISTS predictions
-                    (player_id integer, match_id integer, result result, time timestamp)"""
+                """INSERT INTO predictions
+                    (player_id, match_id, goals1, goals2, winner, time)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (player_id, match_id)
+                    DO UPDATE SET goals1=excluded.goals1, goals2=excluded.goals2,
+                        winner=excluded.winner, result=NULL, time=excluded.time""",
+                (
+                    player.id(),
+                    match.id(),
+                    result.goals1,
+                    result.goals2,
+                    result.winner,
+                    time,
+                ),
             )
 
-    def addPrediction(self, player, match, result, time):
+    def getBetVersions(self):
+        """{match id: version} of the bets, bumped by any process's writes."""
         with self.db() as db:
-            res = db.execute(
-                "SELECT result, time FROM predictions WHERE player_id=? and match_id=?",
-                (player.id(), match.id()),
-            )
-            rows = [r for r in res]
-            if len(rows) == 0:
-                db.execute(
-                    """
-                    INSERT INTO predictions (player_id, match_id, result, time) values(?, ?, ?, ?)
-                    """,
-                    (player.id(), match.id(), result, time),
-                )
-            else:
-                db.execute(
-                    "UPDATE predictions SET result=?, time=?  WHERE player_id=? AND match_id=?",
-                    (result, time, player.id(), match.id()),
+            # data_version moves on commits from other connections, and
+            # total_changes on writes through this one.
+            data_version = db.execute("PRAGMA data_version").fetchone()[0]
+            key = (db.connection, data_version, db.connection.total_changes)
+            if self._bet_versions is None or self._bet_versions[0] != key:
+                versions = dict(
+                    db.execute("SELECT match_id, version FROM prediction_versions")
                 )
+                self._bet_versions = (key, versions)
+        return self._bet_versions[1]
 
     def getForPlayer(self, player):
         predictions = []
         with self.db() as db:
             for row in db.execute(
-                """SELECT result, match_id FROM predictions
-                               WHERE player_id=?""",
+                """SELECT match_id, %s FROM predictions
+                               WHERE player_id=?"""
+                % RESULT_COLUMNS,
                 (player.id(),),
             ):
-                res = row[0]
-                match = self.matches.getMatch(row[1])
+                res = stored_result(*row[1:])
+                match = self.matches.getMatch(row[0])
                 predictions.append((match, res))
         predictions.sort(key=lambda p: p[0].start_time())
         return predictions
@@ -768,11 +1313,12 @@ class Predictions(DbTable):
         predictions = []
         with self.db() as db:
             for row in db.execute(
-                """SELECT player_id, result FROM predictions
-                               WHERE match_id=?""",
+                """SELECT player_id, %s FROM predictions
+                               WHERE match_id=?"""
+                % RESULT_COLUMNS,
                 (match.id(),),
             ):
-                res = row[1]
+                res = stored_result(*row[1:])
                 player = players_by_id.pop(int(row[0]))
                 predictions.append((player, res))
         for no_pred_player in players_by_id.values():
@@ -790,23 +1336,24 @@ class Predictions(DbTable):
 
     def genResults(self, now, verbose=False, is_playoff=False, exclude_match_ids=None):
         players = self.players.getAllPlayers()
-        all_matches = self.matches.getMatchesBefore(now)
+        if is_playoff:
+            all_matches = self.matches.getPlayoffMatchesBefore(now)
+        else:
+            all_matches = self.matches.getMatchesBefore(now)
         if exclude_match_ids is None:
             exclude_match_ids = []
+        with self.standings.lock:
+            self.standings.refresh(self, players, all_matches)
+            return self._genResults(
+                players, all_matches, verbose, is_playoff, exclude_match_ids
+            )
+
+    def _genResults(self, players, all_matches, verbose, is_playoff, exclude_match_ids):
         matches = [m for m in all_matches if m.id() not in exclude_match_ids]
-        predictions = defaultdict(lambda: defaultdict(lambda: None))
-        with self.db() as db:
-            for row in db.execute(
-                """SELECT player_id, match_id, result FROM predictions
-                               WHERE match_id IN (%s)"""
-                % ",".join("?" * len(matches)),
-                tuple(m.id() for m in matches),
-            ):
-                predictions[row[0]][row[1]] = row[2]
-        results = {"matches": [], "players": defaultdict(lambda: {"predictions": []})}
+        results = {"matches": [], "players": {}}
+        for player in players:
+            results["players"][player.id()] = {"predictions": []}
         for match in matches:
-            if is_playoff and not match.is_playoff():
-                continue
             results["matches"].append(
                 {
                     "id": match.id(),
@@ -823,46 +1370,14 @@ class Predictions(DbTable):
                     "short_label": match.label(None, short=True),
                 }
             )
-            match_id = int(match.id())
-            match_predictions = [
-                predictions[player.id()][match_id] for player in players
-            ]
+            infos = self.standings.predictions(match.id(), verbose)
             for player in players:
-                player_id = int(player.id())
-                p = predictions[player_id][match_id]
-                pl_result = match.result()
-                score = (
-                    None
-                    if not match.is_finished()
-                    else pl_result.score(p, match_predictions)
-                )
-                prediction_info = {
-                    "match_id": match_id,
-                    "result": None if p is None else p.label(),
-                    "score": score,
-                }
-                prediction_info["is_exact_score"] = (
-                    pl_result.is_exact_score(p) if score else None
+                results["players"][player.id()]["predictions"].append(
+                    infos[player.id()]
                 )
-                if verbose and match.is_finished():
-                    prediction_info["is_winner_score"] = pl_result.is_winner_score(p)
-                    prediction_info["is_difference_score"] = (
-                        pl_result.is_difference_score(p)
-                    )
-                    prediction_info["is_extra_score"] = pl_result.is_extra_score(p)
-                results["players"][player_id]["predictions"].append(prediction_info)
+        totals = self.standings.totals({m.id() for m in matches}, is_playoff=is_playoff)
         for player in players:
-            score = sum(
-                0 if s["score"] is None else s["score"]
-                for s in results["players"][player.id()]["predictions"]
-            )
-            exact_score = sum(
-                1 if s["is_exact_score"] else 0
-                for s in results["players"][player.id()]["predictions"]
-            )
-            if SCORE_MODE == "fsnorm":
-                score = round(score, 2)
-                exact_score = round(exact_score, 2)
+            score, exact_score = totals[player.id()]
             results["players"][player.id()]["id"] = player.id()
             results["players"][player.id()]["name"] = player.name()
             results["players"][player.id()]["score"] = score
@@ -878,6 +1393,43 @@ class Predictions(DbTable):
         )
         return results
 
+    def getForMatches(self, match_ids):
+        """Bets on the given matches as {match_id: {player_id: result}}."""
+        predictions = defaultdict(dict)
+        with self.db() as db:
+            for row in db.execute(
+                """SELECT player_id, match_id, %s FROM predictions
+                               WHERE match_id IN (%s)"""
+                % (RESULT_COLUMNS, ",".join("?" * len(match_ids))),
+                tuple(match_ids),
+            ):
+                predictions[row[1]][row[0]] = stored_result(*row[2:])
+        return predictions
+
+    def getResultCounts(self, match):
+        """Number of bets on ``match`` per predicted result, counted in SQL."""
+        counts = []
+        with self.db() as db:
+            for row in db.execute(
+                """SELECT goals1, goals2, winner, COUNT(*) FROM predictions
+                               WHERE match_id=? AND goals1 IS NOT NULL
+                               GROUP BY winner, goals1, goals2""",
+                (match.id(),),
+            ):
+                counts.append((Result.get(*row[:3]), row[3]))
+            for row in db.execute(
+                """SELECT result, COUNT(*) FROM predictions
+                               WHERE match_id=? AND goals1 IS NULL
+                               AND result IS NOT NULL GROUP BY result""",
+                (match.id(),),
+            ):
+                if row[0] is not None:
+                    counts.append(tuple(row))
+        return counts
+
+    def getFsnormContext(self, match):
+        return FsnormContext.from_counts(self.getResultCounts(match))
+
     def getMissingPlayers(self, match_id):
         with self.db() as db:
             rows = db.execute(
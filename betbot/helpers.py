@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import math
 import re
@@ -252,6 +253,87 @@ def send_match_event(bot, db, config, match, event, group_id=None):
     )
 
 
+def _event_fields(event):
+    team = event.get("team") or {}
+    player = event.get("player") or {}
+    time = event.get("time") or {}
+    return (
+        event.get("type"),
+        event.get("detail"),
+        team.get("id"),
+        player.get("id") or player.get("name"),
+        time.get("elapsed"),
+        time.get("extra"),
+    )
+
+
+def _digest(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+
+
+def event_key(fixture_id, event):
+    """Stable identity of a fixture event: same event, same key on any read."""
+    return _digest(fixture_id, *_event_fields(event))
+
+
+def event_slot(event):
+    """Where an event happened: its type, team and minute.
+
+    A VAR correction (another scorer, a goal turned own goal) changes the key
+    of an event but not its slot.
+    """
+    ev_type, _, team_id, _, elapsed, _ = _event_fields(event)
+    return _digest(ev_type, team_id, elapsed)
+
+
+def send_new_match_events(bot, db, config, match, events, current):
+    """Post those of ``events`` not posted before and record them.
+
+    ``current`` is the match's whole event list as stored now. An unseen
+    event taking the slot of a posted one that is gone from ``current`` is a
+    correction of it: it's recorded in its place instead of posted again.
+    """
+    mid = match.id()
+    posted = db.match_events.getEvents(mid)
+    current_keys = None
+    for ev in events:
+        key = event_key(mid, ev)
+        if key in posted:
+            continue
+        slot = event_slot(ev)
+        in_slot = db.match_events.getSlotKeys(mid, slot)
+        if in_slot:
+            if current_keys is None:
+                current_keys = {event_key(mid, e) for e in current}
+            edited = sorted(in_slot - current_keys)
+            if edited:
+                logger.info("Event of match %s updated: %s", mid, ev)
+                db.match_events.replaceEvent(mid, edited[0], key, slot)
+                continue
+        logger.info("Send unprocessed event %s", ev)
+        send_match_event(bot, db, config, match, ev)
+        db.match_events.addEvent(mid, key, slot)
+
+
+def seed_posted_events(db, reader, matches):
+    """Record the stored events of ``matches`` as posted, on a first start.
+
+    Does nothing once match_events has any row. Until then, e.g. right after
+    deploying it during a match, what's in the journal already went out from
+    the previous bot. Reads each match from ``reader``, a sources.EventReader,
+    so only later events come back from it.
+    """
+    if not db.match_events.isEmpty():
+        return False
+    for match in matches:
+        mid = match.id()
+        db.match_events.addEvents(
+            mid,
+            [(event_key(mid, ev), event_slot(ev)) for ev in reader.read_new(mid)],
+        )
+    return True
+
+
 def send_match_predictions(bot, db, config, match):
     keyboard = telebot.types.InlineKeyboardMarkup(row_width=1)
     keyboard.add(
@@ -263,16 +345,12 @@ def send_match_predictions(bot, db, config, match):
     player_match_predictions = db.predictions.getForMatch(match)
     text = messages.RESULTS_TITLE % match.label()
     text += "\n```\n"
-    match_predictions = [mp[1] for mp in player_match_predictions]
+    context = db.predictions.getFsnormContext(match)
     for player, pred in player_match_predictions:
         pred_score_text = ""
         if SCORE_MODE == "fsnorm":
-            pred_winner_score = (
-                pred.fsnorm_winner_score(pred, match_predictions) if pred else None
-            )
-            pred_exact_score = (
-                pred.fsnorm_exact_score(pred, match_predictions) if pred else None
-            )
+            pred_winner_score = context.winner_share(pred) if pred else None
+            pred_exact_score = context.exact_share(pred) if pred else None
             pred_score_text = (
                 f"({pred_exact_score:.2f}, {pred_winner_score:.2f})"
                 if pred is not None
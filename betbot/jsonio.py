@@ -0,0 +1,33 @@
+"""JSON encoding for the shared data files, through orjson when installed.
+
+Fixtures, events, update state and results.json are read and written by
+every process on each tick. orjson parses and serializes them several times
+faster than the stdlib; without it the stdlib module is used. Either way the
+files decode to the same data (orjson just skips the spaces and \\u escapes).
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data):
+    """Encode ``data`` as UTF-8 JSON bytes; int dict keys become strings."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data).encode()
+
+
+def loads(raw):
+    """Decode JSON from bytes or str; raises ValueError on bad input."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def load_file(fpath):
+    with open(fpath, "rb") as fp:
+        return loads(fp.read())
@@ -0,0 +1,107 @@
+"""Change signal from the updater to the bots.
+
+After writing fixtures or events the updater bumps a sequence number in a
+small file next to them (sources.publish_change). Bots block on that file
+with a ChangeWatcher and run their update job as soon as it moves, instead
+of waiting for the next periodic tick. The watcher uses Linux inotify when
+available; otherwise (or on filesystems without inotify, like NFS) it falls
+back to comparing the sequence every POLL_INTERVAL.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import time
+
+from . import conf
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) event masks: the sequence file is replaced by rename, but plain
+# writes are caught too.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+# Seconds between sequence checks without inotify.
+POLL_INTERVAL = 1
+
+
+def sequence_path(config):
+    return conf.get_data_file(config, "changes", ext="seq")
+
+
+def read_sequence(config):
+    """Current change sequence number (0 before the first change)."""
+    try:
+        with open(sequence_path(config), "rb") as fp:
+            return int(fp.read())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _inotify_watch(directory):
+    """Non-blocking inotify fd watching ``directory``, or None if unsupported."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    wd = libc.inotify_add_watch(
+        fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO
+    )
+    if wd < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class ChangeWatcher(object):
+    """Waits for the updater's change sequence to move."""
+
+    def __init__(self, config, use_inotify=True):
+        self.config = config
+        self.seen = read_sequence(config)
+        self._fd = None
+        if use_inotify:
+            self._fd = _inotify_watch(os.path.dirname(sequence_path(config)))
+        if self._fd is None:
+            logger.info("inotify unavailable; polling the change sequence")
+
+    def wait(self, timeout):
+        """Block up to ``timeout`` seconds; True if data changed since last time.
+
+        Any change in the shared directory wakes the watcher early, but only a
+        new sequence number counts.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._changed():
+                return True
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            if self._fd is None:
+                time.sleep(min(left, POLL_INTERVAL))
+                continue
+            readable, _, _ = select.select([self._fd], [], [], left)
+            if readable:
+                try:
+                    while os.read(self._fd, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+
+    def _changed(self):
+        seq = read_sequence(self.config)
+        if seq == self.seen:
+            return False
+        self.seen = seq
+        return True
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,168 @@
+"""Queued, rate-limited sending of the bot's own Telegram messages.
+
+The update job posts match events, score tables and reminders to many chats
+at once. Sending them inline would stall the job on the network and, in a
+burst, run into Telegram's flood limits (about 30 messages a second overall,
+one a second per private chat and 20 a minute per group). An Outbox queues
+the messages by priority and a few worker threads send them within those
+limits, waiting out any ``retry_after`` Telegram answers a 429 with.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+import telebot
+
+logger = logging.getLogger(__name__)
+
+# Lower goes first.
+EVENTS = 0
+SCORES = 1
+REMINDERS = 2
+
+WORKERS = 4
+GLOBAL_INTERVAL = 1 / 30
+PRIVATE_CHAT_INTERVAL = 1.0
+GROUP_CHAT_INTERVAL = 3.0
+# Attempts per message when Telegram keeps answering 429.
+SEND_ATTEMPTS = 5
+
+
+class _Message(object):
+    def __init__(self, priority, chat_id, args, kwargs):
+        self.priority = priority
+        self.chat_id = chat_id
+        self.args = args
+        self.kwargs = kwargs
+        self.attempts = 0
+
+
+class _Sender(object):
+    """Stands in for the bot where only ``send_message`` is used."""
+
+    def __init__(self, outbox, priority):
+        self.outbox = outbox
+        self.priority = priority
+
+    def send_message(self, chat_id, *args, **kwargs):
+        self.outbox.send_message(chat_id, *args, priority=self.priority, **kwargs)
+
+
+class Outbox(object):
+    """Priority queue of outgoing messages drained by a pool of workers.
+
+    Messages of one priority go out in order, and so do messages to one chat;
+    a chat still waiting out its interval doesn't hold up the other chats.
+    """
+
+    def __init__(self, bot, workers=WORKERS, clock=time.monotonic):
+        self.bot = bot
+        self.workers = workers
+        self.clock = clock
+        self._queues = collections.defaultdict(collections.deque)
+        self._cond = threading.Condition()
+        self._busy = set()  # chats with a message being sent
+        self._chat_ready = {}  # chat id -> clock time of its next send
+        self._global_ready = 0
+        self._unfinished = 0
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"outbox_{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def send_message(self, chat_id, *args, priority=SCORES, **kwargs):
+        """Queue a ``bot.send_message`` call; returns without waiting for it."""
+        with self._cond:
+            self._queues[priority].append(_Message(priority, chat_id, args, kwargs))
+            self._unfinished += 1
+            self._cond.notify()
+
+    def sender(self, priority):
+        """A bot-like object whose send_message queues at ``priority``."""
+        return _Sender(self, priority)
+
+    def join(self, timeout=None):
+        """Wait until every queued message was sent or given up on."""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._cond:
+            while self._unfinished:
+                left = None if deadline is None else deadline - self.clock()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def _chat_interval(self, chat_id):
+        # Groups and channels have negative ids.
+        return GROUP_CHAT_INTERVAL if chat_id < 0 else PRIVATE_CHAT_INTERVAL
+
+    def _take(self, now):
+        """Pop the first message that may be sent now, else (None, wait)."""
+        wait = None
+        if now < self._global_ready:
+            return None, self._global_ready - now
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            blocked = set()
+            for i, msg in enumerate(queue):
+                chat_id = msg.chat_id
+                if chat_id in blocked or chat_id in self._busy:
+                    blocked.add(chat_id)
+                    continue
+                ready = self._chat_ready.get(chat_id, 0)
+                if ready > now:
+                    blocked.add(chat_id)
+                    wait = ready - now if wait is None else min(wait, ready - now)
+                    continue
+                del queue[i]
+                return msg, None
+        return None, wait
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = self.clock()
+                    msg, wait = self._take(now)
+                    if msg is not None:
+                        break
+                    self._cond.wait(wait)
+                self._busy.add(msg.chat_id)
+                self._global_ready = now + GLOBAL_INTERVAL
+                self._chat_ready[msg.chat_id] = now + self._chat_interval(msg.chat_id)
+            retry_after = self._send(msg)
+            with self._cond:
+                self._busy.discard(msg.chat_id)
+                if retry_after is not None:
+                    self._chat_ready[msg.chat_id] = self.clock() + retry_after
+                    self._queues[msg.priority].appendleft(msg)
+                else:
+                    self._unfinished -= 1
+                self._cond.notify_all()
+
+    def _send(self, msg):
+        """Send ``msg``; seconds to wait before retrying it, or None if done."""
+        msg.attempts += 1
+        try:
+            self.bot.send_message(msg.chat_id, *msg.args, **msg.kwargs)
+        except telebot.apihelper.ApiTelegramException as err:
+            if err.error_code == 429 and msg.attempts < SEND_ATTEMPTS:
+                retry_after = (err.result_json.get("parameters") or {}).get(
+                    "retry_after", 1
+                )
+                logger.warning(
+                    "Flood limit for chat %s; retrying in %ss", msg.chat_id, retry_after
+                )
+                return retry_after
+            logger.error("Error sending message to %s: %s", msg.chat_id, err)
+        except Exception as err:
+            logger.error("Error sending message to %s: %s", msg.chat_id, err)
+        return None
@@ -0,0 +1,88 @@
+"""API call budget for the updater.
+
+RapidAPI plans cap calls per day and per minute. ``api_quota`` in the config,
+e.g. ``{"daily": 100, "per_minute": 10}``, sets either or both limits; the
+budget is shared by every resource and persisted in the update-state file so
+separate cron runs draw from the same bucket.
+"""
+
+import dateutil.parser
+
+
+class QuotaBudget(object):
+    """Daily call counter plus a per-minute token bucket.
+
+    The daily count resets at 00:00 UTC, when RapidAPI resets its quota. The
+    bucket holds up to ``per_minute`` tokens and refills continuously; calls
+    may overdraw it (retries aren't known in advance), which only delays the
+    next ones.
+    """
+
+    @classmethod
+    def from_config(cls, config, state=None):
+        """Budget for ``config["api_quota"]``, or None when there's no quota."""
+        limits = config.get("api_quota") or {}
+        if not limits.get("daily") and not limits.get("per_minute"):
+            return None
+        return cls(limits.get("daily"), limits.get("per_minute"), state)
+
+    def __init__(self, daily=None, per_minute=None, state=None):
+        state = state or {}
+        self.daily = daily
+        self.per_minute = per_minute
+        self.day = state.get("day")
+        self.used = state.get("used", 0)
+        self.tokens = state.get("tokens", per_minute)
+        self.updated = state.get("updated")
+
+    def _refill(self, now):
+        day = now.date().isoformat()
+        if day != self.day:
+            self.day = day
+            self.used = 0
+        if self.per_minute:
+            if self.updated is None:
+                self.tokens = self.per_minute
+            else:
+                elapsed = (now - dateutil.parser.parse(self.updated)).total_seconds()
+                self.tokens = min(
+                    self.per_minute,
+                    self.tokens + max(elapsed, 0) * self.per_minute / 60,
+                )
+        self.updated = now.isoformat()
+
+    def available(self, now):
+        """Calls that may be made right now; None when nothing limits them."""
+        self._refill(now)
+        limits = []
+        if self.daily:
+            limits.append(self.daily - self.used)
+        if self.per_minute:
+            limits.append(int(self.tokens))
+        if not limits:
+            return None
+        return max(0, min(limits))
+
+    def spend(self, calls, now):
+        self._refill(now)
+        self.used += calls
+        if self.per_minute:
+            self.tokens -= calls
+
+    def to_state(self):
+        return {
+            "day": self.day,
+            "used": self.used,
+            "tokens": self.tokens,
+            "updated": self.updated,
+        }
+
+    def __str__(self):
+        parts = []
+        if self.daily:
+            parts.append(
+                "%d/%d calls left today" % (self.daily - self.used, self.daily)
+            )
+        if self.per_minute:
+            parts.append("%.1f/%d this minute" % (self.tokens, self.per_minute))
+        return ", ".join(parts)
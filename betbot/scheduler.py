@@ -0,0 +1,63 @@
+"""Timers for the bot's per-match jobs: kickoff posts and bet reminders.
+
+The update job used to rescan every match on each tick to find kickoffs and
+reminders that had come due. MatchScheduler keeps them in a heap instead, so
+the bot can sleep until exactly the next one.
+"""
+
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MatchScheduler(object):
+    """Fires each timer kind once per match, ``offsets[kind]`` before kickoff.
+
+    Covers matches kicking off after the first plan(); timers already due at
+    that point are skipped, as they were missed while the bot was down.
+    Re-planning after a fixtures change moves the timers of rescheduled
+    matches; one that moved into the past fires on the next pop_due(). Of a
+    match's timers due together only the latest fires, as the window of the
+    earlier ones has passed: a match added less than a day before kickoff
+    gets no day reminder.
+    """
+
+    def __init__(self, offsets):
+        self.offsets = offsets
+        self._since = None
+        self._fired = set()  # (kind, match id)
+        self._heap = []  # (when, kind, match id)
+
+    def plan(self, matches, now):
+        """(Re)build the timers from ``matches``, a database.Matches."""
+        first = self._since is None
+        if first:
+            self._since = now
+        heap = []
+        for m in matches.getMatchesAfter(self._since):
+            for kind, before in self.offsets.items():
+                key = (kind, m.id())
+                if key in self._fired:
+                    continue
+                when = m.start_time() - before
+                if first and when <= now:
+                    self._fired.add(key)
+                    continue
+                heap.append((when, kind, m.id()))
+        heapq.heapify(heap)
+        self._heap = heap
+        logger.info("Planned %d match timers", len(heap))
+
+    def next_time(self):
+        """When the earliest pending timer is due, or None without one."""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """(kind, match id) of the timers due by ``now``, earliest first."""
+        latest = {}  # match id -> its latest due timer
+        while self._heap and self._heap[0][0] <= now:
+            when, kind, mid = heapq.heappop(self._heap)
+            self._fired.add((kind, mid))
+            latest[mid] = (when, kind, mid)
+        return [(kind, mid) for _, kind, mid in sorted(latest.values())]
@@ -0,0 +1,149 @@
+"""Versioned schema migrations for the bot database.
+
+The schema version lives in ``PRAGMA user_version``. Each entry of MIGRATIONS
+upgrades the schema by one version and runs in its own transaction, so a
+database is brought up to date exactly once instead of re-issuing DDL every
+time a table object is built.
+"""
+
+import logging
+import threading
+
+from .sqlite_context import dbopen
+
+logger = logging.getLogger(__name__)
+
+
+def _create_tables(db):
+    db.execute(
+        """CREATE TABLE IF NOT EXISTS players
+            (id integer, first_name text, last_name text, display_name text,
+             is_queen integer not null default 1, timezone text,
+             is_bot integer not null default 0)"""
+    )
+    # Databases from before bot players have the table without is_bot.
+    columns = {row[1] for row in db.execute("PRAGMA table_info(players)")}
+    if "is_bot" not in columns:
+        db.execute("ALTER TABLE players ADD COLUMN is_bot integer not null default 0")
+    db.execute(
+        """CREATE TABLE IF NOT EXISTS pending_requests
+            (id integer PRIMARY KEY, first_name text, last_name text,
+             username text, requested_at text not null)"""
+    )
+    db.execute(
+        """CREATE TABLE IF NOT EXISTS predictions
+            (player_id integer, match_id integer, result result, time timestamp)"""
+    )
+
+
+def _key_predictions(db):
+    # Older databases have no key at all, so concurrent taps could leave
+    # duplicate rows. Keep the latest bet per player/match before adding the
+    # unique index Predictions.addPrediction relies on.
+    db.execute(
+        """DELETE FROM predictions WHERE rowid NOT IN
+            (SELECT (SELECT rowid FROM predictions
+                     WHERE player_id=p.player_id AND match_id=p.match_id
+                     ORDER BY time DESC, rowid DESC LIMIT 1)
+             FROM predictions AS p GROUP BY player_id, match_id)"""
+    )
+    db.execute(
+        """CREATE UNIQUE INDEX IF NOT EXISTS predictions_player_match
+            ON predictions (player_id, match_id)"""
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS predictions_match ON predictions (match_id)")
+
+
+def _compact_results(db):
+    # Bets were stored only as "g1 - g2 (w)" text, which SQL can't filter or
+    # aggregate. Keep the text for rows written before this version and read
+    # the integer columns first; new bets store only the integers.
+    for column in ("goals1", "goals2", "winner"):
+        db.execute("ALTER TABLE predictions ADD COLUMN %s integer" % column)
+    db.execute(
+        """UPDATE predictions SET
+            goals1=CAST(substr(result, 1, 1) AS integer),
+            goals2=CAST(substr(result, 5, 1) AS integer),
+            winner=CAST(substr(result, 8, 1) AS integer)
+            WHERE result GLOB '[0-9] - [0-9] ([012])'"""
+    )
+    # Covers per-match bet counts by score; its match_id prefix replaces the
+    # plain match index.
+    db.execute("DROP INDEX IF EXISTS predictions_match")
+    db.execute(
+        """CREATE INDEX IF NOT EXISTS predictions_match_result
+            ON predictions (match_id, winner, goals1, goals2)"""
+    )
+
+
+def _match_events(db):
+    # Keys of match events already posted to the group, so a restarted bot
+    # neither re-posts nor skips any. ``slot`` ties an event to its place in
+    # the match, to recognise VAR corrections of an event already posted.
+    db.execute(
+        """CREATE TABLE IF NOT EXISTS match_events
+            (match_id integer not null, event_key text not null,
+             slot text not null, PRIMARY KEY (match_id, event_key))"""
+    )
+
+
+def _prediction_versions(db):
+    # A counter per match bumped by every write to its bets, whichever process
+    # or script makes it, so the standings know what to rescore.
+    db.execute(
+        """CREATE TABLE IF NOT EXISTS prediction_versions
+            (match_id integer PRIMARY KEY, version integer not null)
+            WITHOUT ROWID"""
+    )
+    db.execute(
+        """INSERT OR IGNORE INTO prediction_versions
+            SELECT DISTINCT match_id, 1 FROM predictions"""
+    )
+    for event, row in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")):
+        db.execute(
+            """CREATE TRIGGER IF NOT EXISTS predictions_%(event)s_version
+                AFTER %(event)s ON predictions BEGIN
+                    UPDATE prediction_versions SET version=version + 1
+                        WHERE match_id=%(row)s.match_id;
+                    INSERT INTO prediction_versions SELECT %(row)s.match_id, 1
+                        WHERE NOT EXISTS (SELECT 1 FROM prediction_versions
+                                          WHERE match_id=%(row)s.match_id);
+                END"""
+            % {"event": event, "row": row}
+        )
+
+
+# Version N of the schema is reached by applying MIGRATIONS[:N]. Append only.
+MIGRATIONS = [
+    _create_tables,
+    _key_predictions,
+    _compact_results,
+    _match_events,
+    _prediction_versions,
+]
+
+_migrated = set()
+_lock = threading.Lock()
+
+
+def get_version(db):
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path):
+    """Upgrade ``db_path`` to the latest schema; a no-op after the first call."""
+    with _lock:
+        if db_path in _migrated:
+            return
+        while True:
+            with dbopen(db_path) as db:
+                # Take the write lock before reading the version so two
+                # processes starting together don't run the same step twice.
+                db.execute("BEGIN IMMEDIATE")
+                version = get_version(db)
+                if version >= len(MIGRATIONS):
+                    break
+                logger.info("Migrating %s to schema version %d", db_path, version + 1)
+                MIGRATIONS[version](db)
+                db.execute("PRAGMA user_version = %d" % (version + 1))
+        _migrated.add(db_path)
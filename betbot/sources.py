@@ -1,16 +1,22 @@
 import re
 import os
+import email.utils
+import hashlib
+import random
 import tempfile
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-import json
 import logging
 
 import dateutil.parser
 import pytz
 import requests
+from requests.adapters import HTTPAdapter
 
-from . import conf, utils
+from . import conf, jsonio, notify, utils
 
 # api-football finished fixture status codes (see fixtures endpoint docs).
 FINISHED_STATUSES = {"FT", "AET", "PEN"}
@@ -18,9 +24,26 @@ FINISHED_STATUSES = {"FT", "AET", "PEN"}
 # time + extra time + stoppage and typical kickoff delays.
 MATCH_EVENT_WINDOW = timedelta(hours=3)
 
-
-def _dump_json_atomic(fpath, data):
-    """Write JSON so readers never observe a half-written file.
+API_BASE_URL = "https://api-football-v1.p.rapidapi.com/v3"
+API_HOST = "api-football-v1.p.rapidapi.com"
+# (connect, read) timeouts in seconds; without them a stalled call hangs the
+# updater tick.
+API_TIMEOUT = (5, 20)
+# Attempts per call when the API answers RETRY_STATUSES or the connection
+# fails. Waits back off exponentially from API_BACKOFF with full jitter, or
+# follow the server's Retry-After, capped at API_MAX_WAIT.
+API_ATTEMPTS = 4
+API_BACKOFF = 1.0
+API_MAX_WAIT = 60
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Keep-alive connections kept per host; covers concurrent events polling.
+API_POOL_SIZE = 16
+# Events calls in flight at once during one save_events run.
+EVENTS_WORKERS = 8
+
+
+def _write_atomic(fpath, payload):
+    """Write bytes so readers never observe a half-written file.
 
     Both bot containers read these files live from a shared volume, so a
     partial write could be parsed mid-update. Writing to a temp file in the
@@ -29,8 +52,8 @@ def _dump_json_atomic(fpath, data):
     directory = os.path.dirname(fpath) or "."
     fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
     try:
-        with os.fdopen(fd, "w") as fp:
-            json.dump(data, fp)
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(payload)
         os.replace(tmp, fpath)
     except Exception:
         try:
@@ -40,20 +63,124 @@ def _dump_json_atomic(fpath, data):
         raise
 
 
+def _dump_json_atomic(fpath, data):
+    _write_atomic(fpath, jsonio.dumps(data))
+
+
+def publish_change(config):
+    """Bump the change sequence the bots' notify.ChangeWatcher blocks on.
+
+    Called after fixtures or events are written, so the bots pick them up
+    right away rather than on their next periodic tick.
+    """
+    seq = notify.read_sequence(config) + 1
+    _write_atomic(notify.sequence_path(config), b"%d" % seq)
+
+
 def fifa_worldcup():
     source = "https://raw.githubusercontent.com/lsv/fifa-worldcup-2018/master/data.json"
     resp = requests.get(source)
     return resp.json()
 
 
+class ApiStats(object):
+    """Call, error and latency counters of api_football, per resource."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._resources = {}
+
+    def record(self, resource, latency, error=False):
+        with self._lock:
+            stats = self._resources.setdefault(
+                resource,
+                {"calls": 0, "errors": 0, "latency_total": 0.0, "latency_max": 0.0},
+            )
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["latency_total"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {resource: dict(s) for resource, s in self._resources.items()}
+
+    def total_calls(self):
+        """HTTP requests made so far, retries included."""
+        with self._lock:
+            return sum(s["calls"] for s in self._resources.values())
+
+
+API_STATS = ApiStats()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide requests session, so api-football calls reuse connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=API_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _retry_wait(resp, attempt):
+    """Seconds to sleep before retrying after failed ``attempt`` (1-based)."""
+    retry_after = resp.headers.get("Retry-After") if resp is not None else None
+    if retry_after:
+        try:
+            wait = float(retry_after)
+        except ValueError:
+            try:
+                when = email.utils.parsedate_to_datetime(retry_after)
+                wait = (when - utils.utcnow()).total_seconds()
+            except (TypeError, ValueError):
+                wait = None
+        if wait is not None:
+            return min(max(wait, 0), API_MAX_WAIT)
+    return random.uniform(0, min(API_MAX_WAIT, API_BACKOFF * 2 ** (attempt - 1)))
+
+
 def api_football(config, resource_url, query):
-    url = f"https://api-football-v1.p.rapidapi.com/v3/{resource_url}"
+    url = "%s/%s" % (config.get("api_base_url", API_BASE_URL), resource_url)
 
     headers = {
         "X-RapidAPI-Key": config["api_token"],
-        "X-RapidAPI-Host": "api-football-v1.p.rapidapi.com",
+        "X-RapidAPI-Host": API_HOST,
     }
-    resp = requests.get(url, headers=headers, params=query)
+    session = get_session()
+    for attempt in range(1, API_ATTEMPTS + 1):
+        started = time.monotonic()
+        resp = error = None
+        try:
+            resp = session.get(url, headers=headers, params=query, timeout=API_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as err:
+            error = err
+        latency = time.monotonic() - started
+        failed = resp is None or resp.status_code >= 400
+        API_STATS.record(resource_url, latency, error=failed)
+        logging.debug(f"API {resource_url} attempt {attempt}: {latency:.3f}s")
+        retry = resp is None or resp.status_code in RETRY_STATUSES
+        if not retry or attempt == API_ATTEMPTS:
+            break
+        wait = _retry_wait(resp, attempt)
+        logging.warning(
+            f"API {resource_url} failed ({error or resp.status_code}),"
+            f" retrying in {wait:.1f}s"
+        )
+        time.sleep(wait)
+    if resp is None:
+        raise error
     resp.raise_for_status()
     data = resp.json()
     results = data["results"]
@@ -68,8 +195,7 @@ def api_football(config, resource_url, query):
 
 
 def get_teams_info(config):
-    with open(config["countries_file"]) as fp:
-        data = json.load(fp)
+    data = jsonio.load_file(config["countries_file"])
     return {
         c["name"]: {
             "flag": c["flag"]["unicode"],
@@ -166,14 +292,81 @@ def convert_api_v3(config, data):
     return converted
 
 
+class FileState(object):
+    """Tells whether a set of files changed since the last check.
+
+    A ``stat()`` per file answers the common "nothing happened" case; only when
+    mtime or size moved are the contents hashed, so a rewrite with identical
+    data (the updater refreshing an unchanged fixture list) still counts as
+    unchanged. Missing files are part of the state too.
+    """
+
+    def __init__(self, *paths):
+        self.paths = paths
+        self._stats = None
+        # Hash of the contents as of the last changed() call.
+        self.digest = None
+
+    def _stat(self):
+        stats = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                stats.append(None)
+            else:
+                # The updater replaces files, so a rewrite gets a new inode.
+                stats.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        return stats
+
+    def hash(self):
+        """Hash of the files' current contents."""
+        digest = hashlib.blake2b(digest_size=16)
+        for path in self.paths:
+            try:
+                with open(path, "rb") as fp:
+                    digest.update(fp.read())
+            except FileNotFoundError:
+                digest.update(b"\0missing")
+            digest.update(b"\0")
+        return digest.digest()
+
+    def changed(self):
+        """True on the first call and whenever the contents changed since."""
+        stats = self._stat()
+        if stats == self._stats:
+            return False
+        self._stats = stats
+        digest = self.hash()
+        if digest == self.digest:
+            return False
+        self.digest = digest
+        return True
+
+    def reset(self):
+        """Forget the last state, so the next changed() is True."""
+        self._stats = None
+        self.digest = None
+
+
+def fixtures_state(config):
+    """FileState for everything load_fixtures reads."""
+    paths = [conf.get_data_file(config, "fixtures")]
+    if config.get("countries_file"):
+        paths.append(config["countries_file"])
+    return FileState(*paths)
+
+
 def load_fixtures(config):
     data_fpath = conf.get_data_file(config, "fixtures")
-    with open(data_fpath) as fp:
-        season_data = json.load(fp)
+    season_data = jsonio.load_file(data_fpath)
     return convert_api_v3(config, season_data)
 
 
-def save_fixtures(config):
+def save_fixtures(config, max_calls=None):
+    """Download the league's fixtures into the shared file (one API call)."""
+    if max_calls is not None and max_calls < 1:
+        return
     league_id = config["league_id"]
     season = config.get("season")
     query = {"league": league_id}
@@ -184,14 +377,162 @@ def save_fixtures(config):
     data_fpath = conf.get_data_file(config, "fixtures")
     logging.info(f"Saving fixtures to {data_fpath}")
     _dump_json_atomic(data_fpath, data)
+    save_fixtures_snapshot(config, data)
+    publish_change(config)
+
+
+# api-football accepts at most this many ids per fixtures?ids= call.
+FIXTURE_IDS_PER_CALL = 20
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Per-fixture details the ``ids`` query adds to a fixture.
+IDS_DETAIL_KEYS = ("events", "lineups", "statistics", "players")
+
+
+def save_live_fixtures(config, max_calls=None):
+    """Refresh only the fixtures that can be changing, merged into the file.
+
+    Those are the unfinished fixtures that kicked off within
+    MATCH_EVENT_WINDOW: in play, or over but not yet marked finished. They
+    are fetched by id, FIXTURE_IDS_PER_CALL per call, and replace their old
+    entries in the stored list by fixture id. A slower full save_fixtures
+    picks up everything else (reschedules, new knockout pairings).
+    """
+    stored = _load_raw_fixtures(config)
+    if not stored:
+        logging.info("No stored fixtures yet; doing a full refresh")
+        save_fixtures(config, max_calls)
+        return
+    now = utils.utcnow()
+    fixture_ids = [
+        fix["fixture"]["id"]
+        for fix in stored
+        if fix["fixture"]["status"]["short"] not in FINISHED_STATUSES
+        and _fixture_start(fix) <= now <= _fixture_start(fix) + MATCH_EVENT_WINDOW
+    ]
+    batches = list(_batches(fixture_ids, FIXTURE_IDS_PER_CALL))
+    if max_calls is not None:
+        batches = batches[:max_calls]
+    fresh = {}
+    for batch in batches:
+        query = {"ids": "-".join(str(fid) for fid in batch)}
+        for fix in api_football(config, "fixtures", query):
+            # Events are journaled by save_events; keep the fixtures file lean.
+            for key in IDS_DETAIL_KEYS:
+                fix.pop(key, None)
+            fresh[fix["fixture"]["id"]] = fix
+    if not fresh:
+        return
+    merged = [fresh.get(fix["fixture"]["id"], fix) for fix in stored]
+    data_fpath = conf.get_data_file(config, "fixtures")
+    logging.info(f"Merging {len(fresh)} live fixtures into {data_fpath}")
+    _dump_json_atomic(data_fpath, merged)
+    save_fixtures_snapshot(config, merged)
+    publish_change(config)
+
+
+# Bump when the snapshot layout or convert_api_v3's output changes.
+SNAPSHOT_VERSION = 3
+_SNAPSHOT_TOURS = ("league", "groups", "knockout")
+
+
+def save_fixtures_snapshot(config, data):
+    """Write the converted fixtures as a JSON snapshot next to the fixtures.
+
+    Teams and matches are stored column-wise with kickoffs as UTC epoch
+    seconds, so bots can rebuild the match model without walking the API
+    payload or parsing dates. The snapshot records the hash of the fixtures
+    and countries files it was built from; a bot only trusts it while they
+    still match.
+    """
+    converted = convert_api_v3(config, data)
+    rows = []
+    for tour in _SNAPSHOT_TOURS:
+        for section, subgroup in converted[tour].items():
+            for match in subgroup["matches"]:
+                row = dict(match, tour=tour, section=section)
+                row["start_ts"] = int(dateutil.parser.parse(match["date"]).timestamp())
+                rows.append(row)
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "digest": fixtures_state(config).hash().hex(),
+        "teams": _to_columns(converted["teams"]),
+        "matches": _to_columns(rows),
+    }
+    _dump_json_atomic(conf.get_data_file(config, "fixtures", "snapshot"), snapshot)
+
+
+def _to_columns(records):
+    """A value list per key, plus the rows missing each key (only playoff
+    matches have all of them)."""
+    keys = sorted({key for record in records for key in record})
+    absent = {
+        key: [i for i, record in enumerate(records) if key not in record]
+        for key in keys
+    }
+    return {
+        "values": {key: [record.get(key) for record in records] for key in keys},
+        "absent": {key: rows for key, rows in absent.items() if rows},
+    }
+
+
+def _from_columns(columns):
+    values = columns["values"]
+    records = [dict(zip(values, row)) for row in zip(*values.values())]
+    for key, rows in columns["absent"].items():
+        for i in rows:
+            del records[i][key]
+    return records
+
+
+def load_fixtures_snapshot(config, digest):
+    """Converted fixtures from the snapshot if it was built from ``digest``.
+
+    ``digest`` is the fixtures_state() hash of the files as the caller sees
+    them. Returns None when the snapshot is missing, stale or from another
+    version; callers fall back to load_fixtures.
+    """
+    fpath = conf.get_data_file(config, "fixtures", "snapshot")
+    try:
+        snapshot = jsonio.load_file(fpath)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logging.warning(f"Unreadable fixtures snapshot {fpath}")
+        return None
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get("version") != SNAPSHOT_VERSION
+        or snapshot.get("digest") != digest.hex()
+    ):
+        return None
+    converted = {tour: {} for tour in _SNAPSHOT_TOURS}
+    converted["teams"] = _from_columns(snapshot["teams"])
+    for match in _from_columns(snapshot["matches"]):
+        section = match.pop("section")
+        subgroup = converted[match.pop("tour")].setdefault(
+            section, {"name": section, "matches": []}
+        )
+        subgroup["matches"].append(match)
+    return converted
 
 
 def load_update_state(config):
     """Last-run timestamps per resource for the config-driven updater (or {})."""
     data_fpath = conf.get_data_file(config, "update-state")
     try:
-        with open(data_fpath) as fp:
-            return json.load(fp)
+        return jsonio.load_file(data_fpath)
     except (FileNotFoundError, ValueError):
         return {}
 
@@ -213,47 +554,280 @@ def _load_raw_fixtures(config):
     """Raw api-football fixtures payload saved by save_fixtures (or [])."""
     data_fpath = conf.get_data_file(config, "fixtures")
     try:
-        with open(data_fpath) as fp:
-            return json.load(fp)
+        return jsonio.load_file(data_fpath)
     except (FileNotFoundError, ValueError):
         return []
 
 
-def load_events(config):
-    """Stored events keyed by string fixture id (or {} if none yet).
+# Fixtures file -> (FileState, its parsed fixtures), for _cached_raw_fixtures.
+_RAW_FIXTURES = {}
 
-    This is the shared snapshot both bots read instead of each calling the
-    live API. Only the single updater writes it.
+
+def _cached_raw_fixtures(config):
+    """_load_raw_fixtures, parsed again only once the file changed.
+
+    For the updater's every-tick readers; the list is shared, so callers
+    must not modify it.
     """
+    fpath = conf.get_data_file(config, "fixtures")
+    state, fixtures = _RAW_FIXTURES.get(fpath, (None, None))
+    if state is None:
+        state = FileState(fpath)
+    if state.changed() or fixtures is None:
+        fixtures = _load_raw_fixtures(config)
+    _RAW_FIXTURES[fpath] = (state, fixtures)
+    return fixtures
+
+
+def _legacy_events(config):
+    """Whole-file events snapshot written before the journal (or {})."""
     data_fpath = conf.get_data_file(config, "events")
     try:
-        with open(data_fpath) as fp:
-            return json.load(fp)
+        return jsonio.load_file(data_fpath)
     except (FileNotFoundError, ValueError):
         return {}
 
 
+# Events are journaled per fixture: one append-only file of JSON lines each,
+# in a directory shared by the updater and both bots. A record is either
+# {"add": [...]}, events appended to the list, or {"reset": [...]}, the whole
+# list when it changed otherwise (VAR corrections, removed events).
+def _journal_dir(config):
+    return conf.get_data_file(config, "events", ext="journal")
+
+
+def _journal_path(config, fixture_id):
+    return os.path.join(_journal_dir(config), f"{fixture_id}.jsonl")
+
+
+def _apply_record(events, record):
+    if "reset" in record:
+        return list(record["reset"])
+    return events + record["add"]
+
+
+def _read_journal(fpath, offset=0):
+    """Complete records from byte ``offset`` on: (records, end offset, inode).
+
+    A line still being appended (no trailing newline yet) is left for the
+    next read.
+    """
+    with open(fpath, "rb") as fp:
+        fp.seek(offset)
+        data = fp.read()
+        inode = os.fstat(fp.fileno()).st_ino
+    end = data.rfind(b"\n") + 1
+    records = [jsonio.loads(line) for line in data[:end].splitlines() if line]
+    return records, offset + end, inode
+
+
+def _journal_events(config, fixture_id):
+    """Current events of a fixture replayed from its journal, None without one."""
+    try:
+        records, _, _ = _read_journal(_journal_path(config, fixture_id))
+    except FileNotFoundError:
+        return None
+    events = []
+    for record in records:
+        events = _apply_record(events, record)
+    return events
+
+
+def _journal_fixture_ids(config):
+    try:
+        names = os.listdir(_journal_dir(config))
+    except FileNotFoundError:
+        return []
+    return [name[:-6] for name in names if name.endswith(".jsonl")]
+
+
+def _cursor_path(config, fixture_id):
+    return os.path.join(_journal_dir(config), f"{fixture_id}.cursor")
+
+
+def _events_digest(events):
+    return hashlib.blake2b(jsonio.dumps(events), digest_size=16).hexdigest()
+
+
+def _writer_cursor(config, fixture_id, st):
+    """(event count, digest) of the journal with stat ``st``.
+
+    Read from the cursor _append_events leaves next to the journal; the
+    journal is replayed only if it moved since (another writer, a crash
+    between the two writes).
+    """
+    try:
+        cursor = jsonio.load_file(_cursor_path(config, fixture_id))
+    except (FileNotFoundError, ValueError):
+        cursor = None
+    if cursor and [cursor["inode"], cursor["size"]] == [st.st_ino, st.st_size]:
+        return cursor["count"], cursor["digest"]
+    events = _journal_events(config, fixture_id) or []
+    return len(events), _events_digest(events)
+
+
+def _append_events(config, fixture_id, events, legacy):
+    """Journal ``events`` as the fixture's current list; only the change is
+    appended. Returns whether anything was written.
+
+    A fixture without a journal starts from its ``legacy`` snapshot entry.
+    """
+    fpath = _journal_path(config, fixture_id)
+    try:
+        st = os.stat(fpath)
+    except FileNotFoundError:
+        st = None
+    if st is None:
+        current = legacy.get(str(fixture_id), [])
+        known, digest = len(current), _events_digest(current)
+    else:
+        known, digest = _writer_cursor(config, fixture_id, st)
+    if _events_digest(events) == digest:
+        return False
+    if st is not None and _events_digest(events[:known]) == digest:
+        record = {"add": events[known:]}
+    else:
+        record = {"reset": events}
+    os.makedirs(_journal_dir(config), exist_ok=True)
+    # One write in append mode, so readers never see records interleaved.
+    with open(fpath, "ab") as fp:
+        fp.write(jsonio.dumps(record) + b"\n")
+    st = os.stat(fpath)
+    cursor = {
+        "inode": st.st_ino,
+        "size": st.st_size,
+        "count": len(events),
+        "digest": _events_digest(events),
+    }
+    _dump_json_atomic(_cursor_path(config, fixture_id), cursor)
+    return True
+
+
+def load_events(config):
+    """Stored events keyed by string fixture id (or {} if none yet).
+
+    This is the shared store both bots read instead of each calling the live
+    API. Only the single updater writes it. Replays every journal; the bots
+    follow single fixtures with an EventReader instead.
+    """
+    events = _legacy_events(config)
+    for fid in _journal_fixture_ids(config):
+        events[fid] = _journal_events(config, fid)
+    return events
+
+
 def get_stored_events(config, fixture_id):
-    """Events for one fixture from the shared snapshot (JSON keys are str)."""
-    return load_events(config).get(str(fixture_id), [])
+    """Events for one fixture from the shared store."""
+    events = _journal_events(config, fixture_id)
+    if events is None:
+        return _legacy_events(config).get(str(fixture_id), [])
+    return events
 
 
 def set_fixture_events(config, fixture_id, events):
-    """Replace stored events for one fixture in the shared events file.
+    """Replace stored events for one fixture in the shared store.
 
     Lets the /testEventsFile preview push sample events through the very same
-    file the updater writes and both bots read.
+    journal the updater writes and both bots read.
+    """
+    if _append_events(config, fixture_id, events, _legacy_events(config)):
+        publish_change(config)
+
+
+class EventReader(object):
+    """Follows fixture event journals, returning only what's new.
+
+    Keeps a byte offset and the replayed list per fixture, so a read costs
+    only the records appended since the previous one. A journal replaced
+    underneath (new inode, or shorter than the offset) is replayed from the
+    start; events seen before are not returned again.
     """
-    stored = dict(load_events(config))
-    stored[str(fixture_id)] = events
-    _dump_json_atomic(conf.get_data_file(config, "events"), stored)
+
+    def __init__(self, config):
+        self.config = config
+        self._cursors = {}  # fixture id -> (inode, offset, events)
+        self._legacy = None
+
+    def read_new(self, fixture_id):
+        """Events of ``fixture_id`` stored since the last call (all, at first)."""
+        fixture_id = str(fixture_id)
+        inode, offset, seen = self._cursors.get(fixture_id, (None, 0, None))
+        fpath = _journal_path(self.config, fixture_id)
+        try:
+            st = os.stat(fpath)
+        except FileNotFoundError:
+            if seen is not None:
+                return []
+            if self._legacy is None:
+                self._legacy = _legacy_events(self.config)
+            seen = self._legacy.get(fixture_id, [])
+            self._cursors[fixture_id] = (None, 0, seen)
+            return list(seen)
+        replay = st.st_ino != inode or st.st_size < offset
+        if replay:
+            offset = 0
+        elif st.st_size == offset:
+            return []
+        records, offset, inode = _read_journal(fpath, offset)
+        seen = seen or []
+        events = [] if replay else seen
+        for record in records:
+            events = _apply_record(events, record)
+        self._cursors[fixture_id] = (inode, offset, events)
+        if replay or any("reset" in record for record in records):
+            return [ev for ev in events if ev not in seen]
+        known = len(seen)
+        return events[known:]
+
+    def current(self, fixture_id):
+        """The fixture's whole event list as of the last read_new."""
+        return self._cursors.get(str(fixture_id), (None, 0, []))[2]
+
+
+def compact_events(config, now=None):
+    """Drop journals of fixtures that are finished and past their window.
+
+    Fixtures gone from the fixtures file are dropped too, and the pre-journal
+    snapshot once none of its fixtures is still in its window.
+    """
+    now = now or utils.utcnow()
+    in_window = set()
+    keep = set()
+    for fix in _cached_raw_fixtures(config):
+        fid = str(fix["fixture"]["id"])
+        start = _fixture_start(fix)
+        if start <= now <= start + MATCH_EVENT_WINDOW:
+            in_window.add(fid)
+        if now <= start + MATCH_EVENT_WINDOW or (
+            fix["fixture"]["status"]["short"] not in FINISHED_STATUSES
+        ):
+            keep.add(fid)
+    for fid in _journal_fixture_ids(config):
+        if fid not in keep:
+            logging.info(f"Compacting events journal of fixture {fid}")
+            os.remove(_journal_path(config, fid))
+            try:
+                os.remove(_cursor_path(config, fid))
+            except FileNotFoundError:
+                pass
+    legacy_fpath = conf.get_data_file(config, "events")
+    if os.path.exists(legacy_fpath) and not in_window & set(_legacy_events(config)):
+        os.remove(legacy_fpath)
 
 
 def _fixture_start(fix):
     return dateutil.parser.parse(fix["fixture"]["date"]).astimezone(pytz.utc)
 
 
-def save_events(config):
+def load_schedule(config):
+    """(kickoff, is finished) of every stored fixture, in kickoff order."""
+    return sorted(
+        (_fixture_start(fix), fix["fixture"]["status"]["short"] in FINISHED_STATUSES)
+        for fix in _cached_raw_fixtures(config)
+    )
+
+
+def save_events(config, max_calls=None):
     """Refresh stored events for matches currently in play, into a shared file.
 
     A match is "in play" purely by its scheduled kickoff: now is within
@@ -263,17 +837,49 @@ def save_events(config):
 
     Finished matches (per the local fixtures status, refreshed on a slower
     fixtures cron) are skipped early to stop polling before the window ends;
-    their last snapshot is kept (merged) for the bot's finish-cycle read.
+    their journal is kept for the bot's finish-cycle read until the window
+    ends, then dropped by compact_events.
+
+    In-window fixtures are fetched concurrently, up to EVENTS_WORKERS at a
+    time, so a busy matchday costs about one API round trip. Only changes are
+    appended to each fixture's journal; one whose fetch fails keeps its last
+    events.
+
+    With ``max_calls`` fewer than the live fixtures, a random subset of that
+    size is fetched, so over several runs none of them starves.
     """
     now = utils.utcnow()
-    events = dict(load_events(config))
-    for fix in _load_raw_fixtures(config):
+    fixture_ids = []
+    for fix in _cached_raw_fixtures(config):
         fixture = fix["fixture"]
         if fixture["status"]["short"] in FINISHED_STATUSES:
             continue
         start = _fixture_start(fix)
         if start <= now <= start + MATCH_EVENT_WINDOW:
-            events[str(fixture["id"])] = get_fixture_events(config, fixture["id"])
-    data_fpath = conf.get_data_file(config, "events")
-    logging.info(f"Saving events to {data_fpath}")
-    _dump_json_atomic(data_fpath, events)
+            fixture_ids.append(fixture["id"])
+    if max_calls is not None and len(fixture_ids) > max_calls:
+        logging.warning(
+            f"API budget covers {max_calls} of {len(fixture_ids)} live fixtures"
+        )
+        fixture_ids = random.sample(fixture_ids, max(max_calls, 0))
+    if fixture_ids:
+        workers = min(EVENTS_WORKERS, len(fixture_ids))
+        with ThreadPoolExecutor(workers, thread_name_prefix="events") as pool:
+            futures = [
+                (fid, pool.submit(get_fixture_events, config, fid))
+                for fid in fixture_ids
+            ]
+        legacy = _legacy_events(config)
+        changed = False
+        for fid, future in futures:
+            try:
+                events = future.result()
+            except Exception:
+                logging.exception(f"Events for fixture {fid} failed; keeping last")
+                continue
+            if _append_events(config, fid, events, legacy):
+                logging.info(f"Journaled new events of fixture {fid}")
+                changed = True
+        if changed:
+            publish_change(config)
+    compact_events(config, now)
@@ -1,9 +1,56 @@
 import sqlite3
+import threading
+
+# Statements cached per connection; every table issues a handful of fixed queries.
+CACHED_STATEMENTS = 256
+# How long a writer waits for another connection's lock before raising.
+BUSY_TIMEOUT_MS = 5000
+
+_local = threading.local()
+
+
+def _thread_dict(name):
+    """Per-thread dict stored on the module's thread-local."""
+    return _local.__dict__.setdefault(name, {})
+
+
+def _connect(path):
+    conn = sqlite3.connect(
+        path,
+        detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=%d" % BUSY_TIMEOUT_MS)
+    return conn
+
+
+def get_connection(path):
+    """Long-lived connection to ``path`` owned by the calling thread."""
+    conns = _thread_dict("connections")
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+    return conn
+
+
+def close_connections():
+    """Close the calling thread's pooled connections (tests, shutdown)."""
+    conns = _thread_dict("connections")
+    while conns:
+        _, conn = conns.popitem()
+        conn.close()
 
 
 class dbopen(object):
     """
     Simple CM for sqlite3 databases. Commits everything at exit.
+
+    Connections are pooled per thread and path and stay open between uses, so
+    a burst of short queries doesn't pay a connect/close cycle each. Nested
+    blocks on the same thread share one transaction; the outermost commits it,
+    or rolls it back if the block raised.
     """
 
     def __init__(self, path):
@@ -12,12 +59,19 @@ class dbopen(object):
         self.cursor = None
 
     def __enter__(self):
-        self.conn = sqlite3.connect(
-            self.path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
-        )
+        self.conn = get_connection(self.path)
+        depths = _thread_dict("depths")
+        depths[self.path] = depths.get(self.path, 0) + 1
         self.cursor = self.conn.cursor()
         return self.cursor
 
     def __exit__(self, exc_class, exc, traceback):
-        self.conn.commit()
-        self.conn.close()
+        self.cursor.close()
+        depths = _thread_dict("depths")
+        depths[self.path] -= 1
+        if depths[self.path]:
+            return
+        if exc_class is None:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
@@ -0,0 +1,148 @@
+"""Receive Telegram updates over a webhook instead of long polling.
+
+A small HTTP server takes the updates Telegram POSTs to a secret path, and
+hands them to a bounded pool of workers that run them through the bot's
+registered handlers. Several replicas can sit behind one reverse proxy; a
+full queue answers 503, so Telegram redelivers the update later.
+
+Configured by ``config["webhook"]``, e.g.::
+
+    {"url": "https://bet.example.com/telegram", "listen": "0.0.0.0",
+     "port": 8080, "path": "/telegram", "secret_token": "...", "workers": 4}
+
+``url``, when set, is registered with Telegram on start, with the secret
+token appended as a last path segment: pyTelegramBotAPI 4.4 can't register
+the secret header. Replicas other than the first should set
+``"update_job": false``, so only one posts match news; the players and bets
+the handlers serve are read from the shared SQLite file, which every replica
+sees alike.
+"""
+
+import hmac
+import http.server
+import json
+import logging
+import queue
+import threading
+
+import telebot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "/telegram"
+WORKERS = 4
+# Updates waiting for a worker; beyond this the server answers 503.
+QUEUE_SIZE = 100
+
+
+class WebhookServer(object):
+    """HTTP receiver feeding ``bot.process_new_updates`` from a worker pool."""
+
+    def __init__(
+        self,
+        bot,
+        secret_token,
+        host="127.0.0.1",
+        port=0,
+        path=DEFAULT_PATH,
+        workers=WORKERS,
+        queue_size=QUEUE_SIZE,
+    ):
+        if bot.threaded:
+            # telebot would queue each handler call on its own unbounded pool,
+            # bypassing the bounded one here; run them on our workers instead.
+            bot.threaded = False
+            bot.worker_pool.close()
+        self.bot = bot
+        self.path = secret_path(path, secret_token)
+        self.workers = workers
+        self.updates = queue.Queue(queue_size)
+        self.httpd = http.server.ThreadingHTTPServer(
+            (host, port), self._handler_class()
+        )
+        self.httpd.daemon_threads = True
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.send_response(server.receive(self))
+                self.end_headers()
+
+            def log_message(self, fmt, *args):
+                logger.debug(fmt, *args)
+
+        return Handler
+
+    def receive(self, request):
+        """Queue the update in ``request``; returns the HTTP status to send."""
+        if not hmac.compare_digest(request.path.encode(), self.path.encode()):
+            return 404
+        try:
+            length = int(request.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError("negative Content-Length")
+            update = telebot.types.Update.de_json(
+                json.loads(request.rfile.read(length))
+            )
+        except (ValueError, KeyError, TypeError):
+            return 400
+        try:
+            self.updates.put_nowait(update)
+        except queue.Full:
+            logger.warning("Webhook queue full; Telegram will redeliver")
+            return 503
+        return 200
+
+    def _work(self):
+        while True:
+            update = self.updates.get()
+            try:
+                self.bot.process_new_updates([update])
+            except Exception:
+                logger.exception("Error handling update %s", update.update_id)
+            finally:
+                self.updates.task_done()
+
+    def start(self):
+        """Start the workers and serve in a background thread."""
+        for i in range(self.workers):
+            threading.Thread(
+                target=self._work, name=f"webhook_{i}", daemon=True
+            ).start()
+        threading.Thread(
+            target=self.httpd.serve_forever, name="webhook_http", daemon=True
+        ).start()
+        logger.info("Webhook receiver listening on port %d", self.port)
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def secret_path(url, secret_token):
+    """``url`` (or path) with the secret token as its last segment."""
+    return "%s/%s" % (url.rstrip("/"), secret_token)
+
+
+def from_config(bot, config):
+    """A WebhookServer for ``config["webhook"]``, registered if it has a url."""
+    settings = config["webhook"]
+    server = WebhookServer(
+        bot,
+        settings["secret_token"],
+        host=settings.get("listen", "0.0.0.0"),
+        port=settings.get("port", 8080),
+        path=settings.get("path", DEFAULT_PATH),
+        workers=settings.get("workers", WORKERS),
+    )
+    if settings.get("url"):
+        bot.set_webhook(url=secret_path(settings["url"], settings["secret_token"]))
+        logger.info("Webhook set to %s/<secret>", settings["url"].rstrip("/"))
+    return server
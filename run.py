@@ -46,9 +46,22 @@ if __name__ == "__main__":
     parser.add_argument(
         "--update-events", help="Update events only and exit", action="store_true"
     )
+    parser.add_argument(
+        "--updater-daemon",
+        help="Keep updating resources, polling faster around live matches",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--quota-status", help="Print the API budget left and exit", action="store_true"
+    )
     parser.add_argument(
         "--chart-race", help="Build chart race file and exit", action="store_true"
     )
+    parser.add_argument(
+        "--webhook",
+        help="Receive updates on the configured webhook instead of long polling",
+        action="store_true",
+    )
     args = parser.parse_args(sys.argv[1:])
     if args.results:
         result = commands.dump_results(args.results)
@@ -60,11 +73,15 @@ if __name__ == "__main__":
         result = commands.update_fixtures()
     elif args.update_events:
         result = commands.update_events()
+    elif args.updater_daemon:
+        result = commands.run_updater_daemon()
+    elif args.quota_status:
+        result = commands.quota_status()
     elif args.chart_race:
         import chart_race
 
         chart_race.build_chart_race()
         result = 0
     else:
-        result = bot.start()
+        result = bot.start(use_webhook=args.webhook)
     sys.exit(result)
@@ -1,11 +1,32 @@
 import datetime
+import http.client
+import http.server
 import json
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
 from collections import namedtuple
 
 import pytest
 import pytz
-
-from betbot import conf, database, helpers, messages, sources
+import telebot
+
+from betbot import (
+    conf,
+    database,
+    helpers,
+    jsonio,
+    messages,
+    notify,
+    outbox,
+    quota,
+    scheduler,
+    schema,
+    sources,
+    sqlite_context,
+    webhook,
+)
 
 FakeUser = namedtuple("FakeUser", ["id", "first_name", "last_name", "username"])
 
@@ -255,6 +276,32 @@ def test_pending_request_name_fallback(tmp_path):
     assert pending.getRequest(7).name() == "<id: 7>"
 
 
+def test_dbopen_reuses_wal_connection_per_thread(tmp_path):
+    db_path = str(tmp_path / "base.sqlite")
+    with sqlite_context.dbopen(db_path) as first:
+        conn = first.connection
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        # synchronous=NORMAL
+        assert first.execute("PRAGMA synchronous").fetchone()[0] == 1
+    with sqlite_context.dbopen(db_path) as second:
+        assert second.connection is conn
+    sqlite_context.close_connections()
+    with sqlite_context.dbopen(db_path) as third:
+        assert third.connection is not conn
+
+
+def test_dbopen_rolls_back_on_error(tmp_path):
+    db_path = str(tmp_path / "base.sqlite")
+    with sqlite_context.dbopen(db_path) as db:
+        db.execute("CREATE TABLE t (x integer)")
+    with pytest.raises(RuntimeError):
+        with sqlite_context.dbopen(db_path) as db:
+            db.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError("boom")
+    with sqlite_context.dbopen(db_path) as db:
+        assert db.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
 def test_change_name_reflected_in_player(tmp_path):
     db_path = str(tmp_path / "base.sqlite")
     players = database.Players(db_path, admin_id=1)
@@ -268,6 +315,209 @@ def test_change_name_reflected_in_player(tmp_path):
     assert players.getPlayer(99).short_name() == "John"
 
 
+def test_schema_migrates_legacy_players_once(tmp_path):
+    db_path = str(tmp_path / "base.sqlite")
+    with sqlite_context.dbopen(db_path) as db:
+        db.execute(
+            """CREATE TABLE players (id integer, first_name text, last_name text,
+                display_name text, is_queen integer not null default 1, timezone text)"""
+        )
+        db.execute("INSERT INTO players (id, first_name) VALUES (5, 'Old')")
+    players = database.Players(db_path, admin_id=1)
+    with players.db() as db:
+        assert schema.get_version(db) == len(schema.MIGRATIONS)
+    assert not players.getPlayer(5).is_bot()
+    assert players.createPlayer(6, "Bot", "Bot", is_bot=True).is_bot()
+    # Building more tables on the same file doesn't touch the schema again.
+    database.PendingRequests(db_path)
+    with players.db() as db:
+        assert schema.get_version(db) == len(schema.MIGRATIONS)
+
+
+def test_predictions_migration_dedups_and_upserts(tmp_path):
+    db_path = str(tmp_path / "base.sqlite")
+    t0 = datetime.datetime(2026, 6, 1, 12, 0)
+    with sqlite_context.dbopen(db_path) as db:
+        db.execute(
+            """CREATE TABLE predictions
+                (player_id integer, match_id integer, result result, time timestamp)"""
+        )
+        db.executemany(
+            "INSERT INTO predictions VALUES (?, ?, ?, ?)",
+            [
+                (1, 10, database.Result(1, 0), t0),
+                (1, 10, database.Result(2, 0), t0 + datetime.timedelta(minutes=5)),
+                (2, 10, database.Result(0, 0), t0),
+            ],
+        )
+    players = database.Players(db_path, admin_id=1)
+    player = players.createPlayer(1, "Ann", None)
+    matches = database.Matches(MATCH_DATA, TEAMS)
+    predictions = database.Predictions(db_path, players, matches)
+
+    def rows():
+        bets = predictions.getForMatches([10])[10]
+        return [(pid, str(bets[pid])) for pid in sorted(bets)]
+
+    # The latest of the duplicate bets survives.
+    assert rows() == [(1, "2 - 0 (1)"), (2, "0 - 0 (0)")]
+    with predictions.db() as db:
+        backfilled = db.execute(
+            "SELECT goals1, goals2, winner FROM predictions ORDER BY player_id"
+        ).fetchall()
+    assert backfilled == [(2, 0, 1), (0, 0, 0)]
+
+    class FakeMatch:
+        def id(self):
+            return 10
+
+    predictions.addPrediction(player, FakeMatch(), database.Result(3, 3), t0)
+    assert rows() == [(1, "3 - 3 (0)"), (2, "0 - 0 (0)")]
+    with pytest.raises(sqlite3.IntegrityError):
+        with predictions.db() as db:
+            db.execute(
+                "INSERT INTO predictions (player_id, match_id, time) VALUES (?, ?, ?)",
+                (2, 10, t0),
+            )
+
+
+def test_predictions_store_integer_results(tmp_path):
+    db_path = str(tmp_path / "base.sqlite")
+    t0 = datetime.datetime(2026, 6, 1, 12, 0)
+    players = database.Players(db_path, admin_id=1)
+    ann = players.createPlayer(1, "Ann", None)
+    bob = players.createPlayer(2, "Bob", None)
+    players.createPlayer(3, "Cid", None)
+    matches = database.Matches(MATCH_DATA, TEAMS)
+    match = matches.getMatch("group_1-0")
+    predictions = database.Predictions(db_path, players, matches)
+    predictions.addPrediction(ann, match, database.Result(1, 0), t0)
+    predictions.addPrediction(bob, match, database.Result(2, 0), t0)
+    # A row as written by an older version, with only the text column set.
+    with predictions.db() as db:
+        db.execute(
+            "INSERT INTO predictions (player_id, match_id, result, time)"
+            " VALUES (?, ?, ?, ?)",
+            (3, match.id(), database.Result(1, 0), t0),
+        )
+        stored = db.execute(
+            "SELECT goals1, goals2, winner, result FROM predictions WHERE player_id=1"
+        ).fetchone()
+    assert stored == (1, 0, 1, None)
+
+    bets = predictions.getForMatches([match.id()])[match.id()]
+    assert bets == {1: database.Result(1, 0), 2: database.Result(2, 0), 3: bets[1]}
+    assert bets[3] is database.Result.get(1, 0)
+
+    context = predictions.getFsnormContext(match)
+    expected = database.FsnormContext(bets.values())
+    assert context.total == expected.total == 3
+    assert context.winners == expected.winners
+    assert context.exacts == expected.exacts
+
+
+def _numbered_match_data():
+    """MATCH_DATA with integer match ids, as api-football fixtures have."""
+    data = json.loads(json.dumps(MATCH_DATA))
+    for num, (_, match) in enumerate(database.iter_matches(data), start=1):
+        match["name"] = num
+    return data
+
+
+def _make_predictions(tmp_path, match_data):
+    db_path = str(tmp_path / "base.sqlite")
+    players = database.Players(db_path, admin_id=1)
+    players.createPlayer(1, "Ann", None)
+    players.createPlayer(2, "Bob", None)
+    matches = database.Matches(match_data, database.Teams(match_data))
+    return database.Predictions(db_path, players, matches)
+
+
+def test_gen_results_rescores_only_changed_matches(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "SCORE_MODE", "default")
+    predictions = _make_predictions(tmp_path, _numbered_match_data())
+    ann, bob = predictions.players.getPlayer(1), predictions.players.getPlayer(2)
+    group_win = predictions.matches.getMatch(1)  # 1 - 0
+    group_draw = predictions.matches.getMatch(2)  # 1 - 1
+    t = datetime.datetime(2022, 5, 1)
+    predictions.addPrediction(ann, group_win, database.Result(1, 0), t)
+    predictions.addPrediction(bob, group_draw, database.Result(0, 0), t)
+
+    loaded = []
+    get_for_matches = predictions.getForMatches
+
+    def spy(match_ids):
+        loaded.append(sorted(match_ids))
+        return get_for_matches(match_ids)
+
+    monkeypatch.setattr(predictions, "getForMatches", spy)
+    now = pytz.utc.localize(datetime.datetime(2022, 8, 1))
+    results = predictions.genResults(now)
+    assert loaded == [[1, 2, 3, 4, 5]]
+    assert results["players"][1]["score"] == 3
+    assert results["players"][2]["score"] == 2
+    assert list(results["players"]) == [1, 2]
+
+    # Nothing changed: served from the standings without touching the bets.
+    assert predictions.genResults(now) == results
+    assert loaded == [[1, 2, 3, 4, 5]]
+
+    predictions.addPrediction(bob, group_win, database.Result(2, 0), t)
+    results = predictions.genResults(now)
+    assert loaded[1:] == [[1]]
+    assert results["players"][2]["score"] == 3
+    assert results["players"][2]["exact_score"] == 0
+
+    before = predictions.genResults(now, exclude_match_ids={1})
+    assert before["players"][1]["score"] == 0
+    assert before["players"][2]["score"] == 2
+    assert loaded[2:] == []
+
+
+def test_gen_results_rescores_bets_added_while_reading(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "SCORE_MODE", "default")
+    predictions = _make_predictions(tmp_path, _numbered_match_data())
+    ann = predictions.players.getPlayer(1)
+    group_win = predictions.matches.getMatch(1)  # 1 - 0
+    t = datetime.datetime(2022, 5, 1)
+    get_for_matches = predictions.getForMatches
+
+    def racing_bet(match_ids):
+        bets = get_for_matches(match_ids)
+        # Lands after the bets were read, before they are scored.
+        predictions.addPrediction(ann, group_win, database.Result(1, 0), t)
+        monkeypatch.setattr(predictions, "getForMatches", get_for_matches)
+        return bets
+
+    monkeypatch.setattr(predictions, "getForMatches", racing_bet)
+    now = pytz.utc.localize(datetime.datetime(2022, 8, 1))
+    assert predictions.genResults(now)["players"][1]["score"] == 0
+    assert predictions.genResults(now)["players"][1]["score"] == 3
+
+
+def test_gen_results_rescores_bets_written_elsewhere(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "SCORE_MODE", "default")
+    predictions = _make_predictions(tmp_path, _numbered_match_data())
+    ann = predictions.players.getPlayer(1)
+    group_win = predictions.matches.getMatch(1)  # 1 - 0
+    now = pytz.utc.localize(datetime.datetime(2022, 8, 1))
+    assert predictions.genResults(now)["players"][1]["score"] == 0
+
+    # A webhook replica on the same database file, with its own connection.
+    other = _make_predictions(tmp_path, _numbered_match_data())
+    bet = database.Result(1, 0), datetime.datetime(2022, 5, 1)
+    replica = threading.Thread(target=other.addPrediction, args=(ann, group_win, *bet))
+    replica.start()
+    replica.join()
+    assert predictions.genResults(now)["players"][1]["score"] == 3
+
+    # ... or a fix made straight in SQL from another connection.
+    with sqlite3.connect(predictions.db_path) as conn:
+        conn.execute("UPDATE predictions SET goals1=2 WHERE player_id=1")
+    conn.close()
+    assert predictions.genResults(now)["players"][1]["score"] == 1
+
+
 def test_create_queens_page(tmp_path):
     db_path = str(tmp_path / "base.sqlite")
     players = database.Players(db_path, admin_id=1)
@@ -607,6 +857,79 @@ def test_playoff_score_fsnorm(monkeypatch):
     )
 
 
+def test_results_are_interned_and_immutable():
+    stored = database.convert_result(b"2 - 1 (1)")
+    assert stored is database.Result.get(2, 1)
+    assert stored is database.convert_result("2 - 1 (1)")
+    assert database.Result.get(1, 1, 2) is database.Result.get(1, 1, 2)
+    assert database.convert_result(b"garbage") is None
+    # Value semantics still hold for freshly built instances.
+    assert database.Result(2, 1) == stored
+    assert len({database.Result(2, 1), stored}) == 1
+    with pytest.raises(AttributeError):
+        stored.goals1 = 3
+    # Scores outside the bet range are built on demand.
+    assert database.Result.get(12, 0).goals1 == 12
+
+
+def test_double_digit_results_keep_value_semantics():
+    big = database.Result.get(0, 12)
+    assert big != database.Result.get(1, 2)
+    assert hash(big) != hash(database.Result.get(1, 2))
+    assert big == database.Result(0, 12)
+    # A double-digit match score is scored against bets like any other.
+    _scores, hits = database.lookup_scores([big], [[database.Result(1, 2)], [big]])
+    assert hits[0][0] == (True, False, False, False)
+    assert hits[1][0][2]
+
+
+def test_fsnorm_context_scores_like_prediction_list(monkeypatch):
+    monkeypatch.setattr(database, "SCORE_MODE", "fsnorm")
+    matches = database.Matches(MATCH_DATA, TEAMS)
+    result_win = matches.getMatch("group_1-0").result()
+    bets = [
+        database.Result(1, 0),
+        database.Result(2, 0),
+        database.Result(0, 2),
+        None,
+    ]
+    context = database.FsnormContext(bets)
+    assert context.total == 3
+    assert context.winner_share(result_win) == 1.5
+    assert context.exact_share(result_win) == 3.0
+    # A bet nobody else made shares nothing.
+    assert context.exact_share(database.Result(5, 5)) == 0
+    for bet in bets:
+        assert result_win.score(bet, context) == result_win.score(bet, bets)
+
+
+@pytest.mark.parametrize("score_mode", ["default", "fsnorm"])
+@pytest.mark.parametrize("extra_score_mode", ["default", "extratime"])
+def test_lookup_scores_match_per_object_scoring(
+    monkeypatch, score_mode, extra_score_mode
+):
+    monkeypatch.setattr(database, "SCORE_MODE", score_mode)
+    monkeypatch.setattr(database, "EXTRA_SCORE_MODE", extra_score_mode)
+    matches = database.Matches(MATCH_DATA, TEAMS)
+    results = [m.result() for m in matches.matches.values()]
+    bets = [None] + [
+        database.Result(g1, g2, w)
+        for g1 in range(4)
+        for g2 in range(4)
+        for w in range(3)
+        if database.is_valid_result(g1, g2, w)
+    ]
+    # One player per possible bet; each player bets the same on every match.
+    predictions = [[p] * len(results) for p in bets]
+    scores, hits = database.lookup_scores(results, predictions)
+    for row, p in enumerate(bets):
+        for col, result in enumerate(results):
+            expected = result.score(p, bets)
+            assert scores[row][col] == expected
+            assert type(scores[row][col]) is type(expected)
+            assert hits[row][col][2] == result.is_exact_score(p)
+
+
 # ---------------------------------------------------------------------------
 # Live match events ("goals feature")
 #
@@ -810,6 +1133,9 @@ def test_get_fixture_events_swallows_value_error(monkeypatch):
 
 
 class FakeResponse:
+    status_code = 200
+    headers = {}
+
     def __init__(self, data):
         self._data = data
 
@@ -820,13 +1146,17 @@ class FakeResponse:
         return self._data
 
 
+class FakeSession:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        return FakeResponse(self.payload)
+
+
 def test_api_football_returns_response_on_results(monkeypatch):
     payload = {"results": 2, "response": [{"a": 1}, {"b": 2}]}
-    monkeypatch.setattr(
-        sources.requests,
-        "get",
-        lambda url, headers=None, params=None: FakeResponse(payload),
-    )
+    monkeypatch.setattr(sources, "get_session", lambda: FakeSession(payload))
     out = sources.api_football(
         {"api_token": "x"}, "fixtures/events", {"fixture": 1}
     )
@@ -835,15 +1165,89 @@ def test_api_football_returns_response_on_results(monkeypatch):
 
 def test_api_football_raises_on_zero_results(monkeypatch):
     payload = {"results": 0, "errors": {"token": "invalid"}, "response": []}
-    monkeypatch.setattr(
-        sources.requests,
-        "get",
-        lambda url, headers=None, params=None: FakeResponse(payload),
-    )
+    monkeypatch.setattr(sources, "get_session", lambda: FakeSession(payload))
     with pytest.raises(ValueError):
         sources.api_football({"api_token": "x"}, "fixtures/events", {"fixture": 1})
 
 
+@pytest.fixture
+def api_server():
+    """Local stand-in for api-football answering from a queue of responses."""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            status, headers, body = responses.pop(0)
+            seen.append((self.path, self.client_address))
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    responses, seen = [], []
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    ).start()
+    config = {
+        "api_token": "x",
+        "api_base_url": "http://127.0.0.1:%d/v3" % server.server_port,
+    }
+    sources.API_STATS.clear()
+    yield config, responses, seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_api_football_retries_with_pooled_connection(api_server, monkeypatch):
+    config, responses, seen = api_server
+    waits = []
+    monkeypatch.setattr(sources.time, "sleep", waits.append)
+    ok = {"results": 1, "response": [{"a": 1}]}
+    responses.extend(
+        [
+            (503, {}, {}),
+            (429, {"Retry-After": "7"}, {}),
+            (200, {}, ok),
+            (200, {}, ok),
+        ]
+    )
+    assert sources.api_football(config, "fixtures/events", {"fixture": 5}) == [{"a": 1}]
+    assert sources.api_football(config, "fixtures", {"league": 1}) == [{"a": 1}]
+    assert [path for path, _ in seen] == ["/v3/fixtures/events?fixture=5"] * 3 + [
+        "/v3/fixtures?league=1"
+    ]
+    # One keep-alive connection served every request.
+    assert len({client for _, client in seen}) == 1
+    assert 0 <= waits[0] <= sources.API_BACKOFF
+    assert waits[1] == 7
+    stats = sources.API_STATS.snapshot()
+    assert stats["fixtures/events"]["calls"] == 3
+    assert stats["fixtures/events"]["errors"] == 2
+    assert stats["fixtures"] == dict(stats["fixtures"], calls=1, errors=0)
+
+
+def test_api_football_gives_up_after_attempts(api_server, monkeypatch):
+    config, responses, seen = api_server
+    monkeypatch.setattr(sources.time, "sleep", lambda wait: None)
+    responses.extend([(500, {}, {})] * sources.API_ATTEMPTS)
+    with pytest.raises(sources.requests.HTTPError):
+        sources.api_football(config, "fixtures", {"league": 1})
+    assert len(seen) == sources.API_ATTEMPTS
+    # Client errors other than 429 aren't retried.
+    responses.append((403, {}, {}))
+    with pytest.raises(sources.requests.HTTPError):
+        sources.api_football(config, "fixtures", {"league": 1})
+    assert len(seen) == sources.API_ATTEMPTS + 1
+
+
 # ---------------------------------------------------------------------------
 # Shared event storage (single updater writes JSON; both bots read it)
 # ---------------------------------------------------------------------------
@@ -865,6 +1269,219 @@ def _write_raw_fixtures(tmp_path, fixtures):
         json.dump(fixtures, fp)
 
 
+def _api_fixture(fid, home=1, away=2, goals=(None, None), status="NS", rnd="Group A"):
+    """Full api-football v3 fixture, enough for convert_api_v3."""
+    finished = status in sources.FINISHED_STATUSES
+    return {
+        "fixture": {
+            "id": fid,
+            "date": "2026-06-%02dT17:00:00+00:00" % (10 + fid % 10),
+            "status": {"short": status},
+        },
+        "league": {"round": rnd},
+        "teams": {
+            "home": {
+                "id": home,
+                "name": "Team %d" % home,
+                "logo": None,
+                "winner": finished and goals[0] > goals[1],
+            },
+            "away": {
+                "id": away,
+                "name": "Team %d" % away,
+                "logo": None,
+                "winner": finished and goals[1] > goals[0],
+            },
+        },
+        "goals": {"home": goals[0], "away": goals[1]},
+        "score": {
+            "fulltime": {"home": goals[0], "away": goals[1]},
+            "extratime": {"home": None, "away": None},
+            "penalty": {"home": None, "away": None},
+        },
+    }
+
+
+def _fixtures_db(tmp_path, fixtures):
+    config = dict(_events_config(tmp_path), admin_id=1, group_id=1, countries_file=None)
+    _write_raw_fixtures(tmp_path, fixtures)
+    return config, database.Database(config)
+
+
+def test_reload_fixtures_skips_unchanged_file(tmp_path, monkeypatch):
+    _config, db = _fixtures_db(tmp_path, [_api_fixture(1), _api_fixture(2, 3, 4)])
+    assert db.pop_changed_matches() == {1, 2}
+    parse_calls = []
+    monkeypatch.setattr(
+        sources, "convert_api_v3", lambda *a: parse_calls.append(a) or {}
+    )
+    assert db.reload_data() == set()
+
+    # Rewritten with the same contents: new stat, same hash.
+    _write_raw_fixtures(tmp_path, [_api_fixture(1), _api_fixture(2, 3, 4)])
+    assert db.reload_data() == set()
+    assert parse_calls == []
+    assert db.pop_changed_matches() == set()
+
+
+def test_reload_fixtures_swaps_in_changed_matches(tmp_path):
+    _config, db = _fixtures_db(
+        tmp_path, [_api_fixture(1), _api_fixture(2, 3, 4), _api_fixture(3, 1, 3)]
+    )
+    db.pop_changed_matches()
+    matches = db.matches
+    first, second = matches.getMatch(1), matches.getMatch(2)
+    old_matches = matches.matches
+    team = db.teams.get_team(1)
+
+    renamed = _api_fixture(3, 1, 3)
+    renamed["teams"]["home"]["name"] = "Team One"
+    _write_raw_fixtures(
+        tmp_path,
+        [_api_fixture(1, goals=(1, 0), status="FT"), _api_fixture(2, 3, 4), renamed],
+    )
+    # Matches of a renamed team are rebuilt along with the changed ones.
+    assert db.reload_data() == {1, 3}
+    assert db.matches is matches
+    assert matches.getMatch(2) is second
+    assert matches.getMatch(1).is_finished()
+    assert str(matches.getMatch(1).result()) == "1 - 0 (1)"
+    assert matches.getMatch(3).team(0).name() == "Team One"
+    # Teams and matches are swapped together.
+    assert matches.getMatch(3).team(0) is db.teams.get_team(1)
+    # A reader still holding the previous state sees it unchanged.
+    assert old_matches[1] is first and not first.is_finished()
+    assert team.name() == "Team 1"
+
+    # A fixture that disappears from the feed is dropped and reported; match 1
+    # changes with its team's name going back.
+    _write_raw_fixtures(tmp_path, [_api_fixture(1, goals=(1, 0), status="FT")])
+    assert db.reload_data() == {1, 2, 3}
+    assert set(matches.matches) == {1}
+    assert db.pop_changed_matches() == {1, 2, 3}
+
+
+def test_matches_time_index_matches_full_scan(tmp_path):
+    fixtures = [
+        _api_fixture(fid, goals=(1, 1), status="FT" if fid % 3 else "NS")
+        for fid in range(1, 25)
+    ]
+    _config, db = _fixtures_db(tmp_path, fixtures)
+
+    def scan(keep):
+        return sorted(
+            (m for m in db.matches.matches.values() if keep(m.start_time())),
+            key=lambda m: (m.start_time(), not m.is_finished(), m.id()),
+        )
+
+    def check():
+        for day in range(8, 22):
+            for hour in (16, 17, 18):
+                t = pytz.utc.localize(datetime.datetime(2026, 6, day, hour))
+                assert db.matches.getMatchesBefore(t) == scan(lambda s, t=t: s <= t)
+                assert db.matches.getMatchesAfter(t) == scan(lambda s, t=t: s > t)
+                top = t + datetime.timedelta(days=3)
+                assert db.matches.getMatchesAfter(t, days_limit=3) == scan(
+                    lambda s, t=t, top=top: t < s < top
+                )
+
+    check()
+    # Finishing a match moves it within its kickoff slot; the index follows.
+    fixtures[2] = _api_fixture(3, goals=(2, 0), status="FT")
+    _write_raw_fixtures(tmp_path, fixtures)
+    assert db.reload_data() == {3}
+    check()
+
+
+def test_matches_secondary_indexes(tmp_path):
+    fixtures = [
+        _api_fixture(1, 1, 2, goals=(1, 0), status="FT"),
+        _api_fixture(2, 3, 4),
+        _api_fixture(3, 1, 3, rnd="Group B"),
+        _api_fixture(4, 2, 4, goals=(2, 2), status="FT", rnd="Group B"),
+        _api_fixture(5, 1, 4, rnd="Final"),
+    ]
+    _config, db = _fixtures_db(tmp_path, fixtures)
+    matches = db.matches
+
+    def ids(found):
+        return [m.id() for m in found]
+
+    # Fixture N kicks off on June 10 + N.
+    now = pytz.utc.localize(datetime.datetime(2026, 6, 13, 18))
+    assert ids(matches.getMatchesInProgress(now)) == [2, 3]
+    assert ids(matches.getScheduledMatches(now)) == [5]
+    assert ids(matches.getFinishedMatches()) == [1, 4]
+    assert ids(matches.getPlayoffMatchesBefore(now)) == []
+    later = now + datetime.timedelta(days=5)
+    assert ids(matches.getPlayoffMatchesBefore(later)) == [5]
+    assert matches.getRounds() == ["Group A", "Group B", "Final"]
+    assert ids(matches.getMatchesInRound("Group B")) == [3, 4]
+    assert matches.getMatchesInRound("Group Z") == []
+    assert ids(matches.getMatchesForTeam(1)) == [1, 3, 5]
+    assert ids(matches.getMatchesForTeam(4)) == [2, 4, 5]
+
+    fixtures[1] = _api_fixture(2, 3, 4, goals=(0, 1), status="FT")
+    _write_raw_fixtures(tmp_path, fixtures)
+    db.reload_data()
+    assert ids(matches.getMatchesInProgress(now)) == [3]
+    assert ids(matches.getFinishedMatches()) == [1, 2, 4]
+
+
+def test_fixtures_snapshot_loads_without_parsing(tmp_path, monkeypatch):
+    fixtures = [
+        _api_fixture(1, 1, 2, goals=(1, 0), status="FT"),
+        _api_fixture(2, 3, 4),
+        _api_fixture(3, 1, 4, goals=(2, 2), status="PEN", rnd="Final"),
+    ]
+    fixtures[2]["teams"]["away"]["winner"] = True
+    fixtures[2]["score"]["penalty"] = {"home": 3, "away": 4}
+    config, _ = _fixtures_db(tmp_path, fixtures)
+    from_json = database.Database(config)
+    monkeypatch.setattr(sources, "api_football", lambda *args: fixtures)
+    sources.save_fixtures(config)
+    # Plain JSON data, with kickoffs as epoch seconds.
+    snapshot = jsonio.load_file(tmp_path / "fixtures-1-2026.snapshot")
+    assert snapshot["matches"]["values"]["start_ts"][0] == 1781197200
+    assert snapshot["matches"]["absent"]["home_penalty"] == [0, 1]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("parsed fixtures JSON")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(sources, "convert_api_v3", fail)
+        patch.setattr(database.dateutil.parser, "parse", fail)
+        db = database.Database(config)
+    assert str(db.teams) == str(from_json.teams)
+    assert str(db.matches) == str(from_json.matches)
+    assert db.matches.getMatch(3).result() == database.Result(2, 2, 2)
+
+    # A fixtures file newer than the snapshot is parsed as before.
+    fixtures[1] = _api_fixture(2, 3, 4, goals=(0, 1), status="FT")
+    _write_raw_fixtures(tmp_path, fixtures)
+    assert db.reload_data() == {2}
+    assert db.matches.getMatch(2).is_finished()
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_jsonio_round_trips_results(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(jsonio, "orjson", None)
+    elif jsonio.orjson is None:
+        pytest.skip("orjson not installed")
+    results = {
+        "matches": [{"id": 7, "label": "🇦🇷\u2060Argentina 2 - 1 Chile", "score": 1.25}],
+        "players": {42: {"sort_key": (3, 1), "is_queen": True, "score": None}},
+    }
+    raw = jsonio.dumps(results)
+    assert isinstance(raw, bytes)
+    # The same document the stdlib encoder writes, as table.js parses it.
+    assert json.loads(raw) == json.loads(json.dumps(results))
+    assert jsonio.loads(raw) == jsonio.loads(raw.decode())
+    with pytest.raises(ValueError):
+        jsonio.loads(b"{")
+
+
 def test_load_events_missing_returns_empty(tmp_path):
     config = _events_config(tmp_path)
     assert sources.load_events(config) == {}
@@ -937,15 +1554,171 @@ def test_save_events_keeps_last_snapshot_after_match_finishes(tmp_path, monkeypa
     assert stored["10"] == [make_event(player="P10")]
 
 
-def test_save_events_atomic_write_leaves_no_temp_files(tmp_path, monkeypatch):
+def test_save_events_fetches_concurrently_and_isolates_failures(tmp_path, monkeypatch):
+    config = _events_config(tmp_path)
+    monkeypatch.setattr(sources.utils, "utcnow", lambda: FIXED_NOW)
+    with open(tmp_path / "events-1-2026.json", "w") as fp:
+        json.dump({"20": [{"old": True}]}, fp)
+    _write_raw_fixtures(tmp_path, [_raw_fixture(fid) for fid in (10, 20, 30)])
+    # Every fetch waits for the other two, so this only passes if they overlap.
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_events(cfg, fid):
+        barrier.wait()
+        if fid == 20:
+            raise sources.requests.ConnectionError("reset")
+        return [make_event(player="P%s" % fid)]
+
+    monkeypatch.setattr(sources, "get_fixture_events", fake_events)
+    sources.save_events(config)
+
+    stored = sources.load_events(config)
+    assert stored == {
+        "20": [{"old": True}],
+        "10": [make_event(player="P10")],
+        "30": [make_event(player="P30")],
+    }
+
+
+def test_save_live_fixtures_merges_in_play_fixtures_by_id(tmp_path, monkeypatch):
+    config = dict(_events_config(tmp_path), countries_file=None)
+    monkeypatch.setattr(sources.utils, "utcnow", lambda: FIXED_NOW)
+    in_play = [
+        _raw_fixture(fid, "1H", "2026-06-11T17:00:00+00:00") for fid in range(100, 125)
+    ]
+    stored = [
+        _raw_fixture(1, "FT", "2026-06-11T17:00:00+00:00"),
+        _raw_fixture(2, "NS", "2026-06-12T17:00:00+00:00"),
+    ] + in_play
+    _write_raw_fixtures(tmp_path, stored)
+    queries = []
+
+    def fake_api(cfg, resource, query):
+        queries.append((resource, query))
+        ids = [int(fid) for fid in query["ids"].split("-")]
+        return [
+            dict(
+                _raw_fixture(fid, "2H", "2026-06-11T17:00:00+00:00"),
+                events=[make_event()],
+                lineups=[],
+                statistics=[],
+                players=[],
+            )
+            for fid in ids
+        ]
+
+    monkeypatch.setattr(sources, "api_football", fake_api)
+    monkeypatch.setattr(sources, "save_fixtures_snapshot", lambda cfg, data: None)
+    sources.save_live_fixtures(config)
+
+    assert [len(q["ids"].split("-")) for _, q in queries] == [20, 5]
+    assert {resource for resource, _ in queries} == {"fixtures"}
+    merged = sources._load_raw_fixtures(config)
+    assert [fix["fixture"]["id"] for fix in merged] == [1, 2] + list(range(100, 125))
+    statuses = [fix["fixture"]["status"]["short"] for fix in merged]
+    assert statuses == ["FT", "NS"] + ["2H"] * 25
+    # The details embedded in ``ids`` answers aren't stored with the fixtures.
+    assert not any(set(sources.IDS_DETAIL_KEYS) & fix.keys() for fix in merged)
+
+    # With a budget of one call only the first batch is refreshed.
+    queries.clear()
+    sources.save_live_fixtures(config, max_calls=1)
+    assert len(queries) == 1
+
+
+def test_save_events_appends_only_changes_to_journal(tmp_path, monkeypatch):
     config = _events_config(tmp_path)
     monkeypatch.setattr(sources.utils, "utcnow", lambda: FIXED_NOW)
     _write_raw_fixtures(tmp_path, [_raw_fixture(10, "NS", "2026-06-11T17:00:00+00:00")])
-    monkeypatch.setattr(sources, "get_fixture_events", lambda cfg, fid: [])
+    goal, card = make_event(player="A"), make_event(ev_type="Card", player="B")
+    fetched = [[goal], [goal], [goal, card], [card]]
+    monkeypatch.setattr(sources, "get_fixture_events", lambda cfg, fid: fetched.pop(0))
+    for _ in range(4):
+        sources.save_events(config)
+
+    journal = tmp_path / "events-1-2026.journal" / "10.jsonl"
+    records = [json.loads(line) for line in journal.read_text().splitlines()]
+    # Unchanged events append nothing; a removed event resets the list.
+    assert records == [{"reset": [goal]}, {"add": [card]}, {"reset": [card]}]
+    assert sources.get_stored_events(config, 10) == [card]
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+
+def test_save_events_reads_neither_journal_nor_fixtures_again(tmp_path, monkeypatch):
+    config = _events_config(tmp_path)
+    monkeypatch.setattr(sources.utils, "utcnow", lambda: FIXED_NOW)
+    _write_raw_fixtures(tmp_path, [_raw_fixture(10, "NS", "2026-06-11T17:00:00+00:00")])
+    goal, card = make_event(player="A"), make_event(ev_type="Card", player="B")
+    fetched = [[goal], [goal, card], [goal, card]]
+    monkeypatch.setattr(sources, "get_fixture_events", lambda cfg, fid: fetched.pop(0))
     sources.save_events(config)
-    names = [p.name for p in tmp_path.iterdir()]
-    assert "events-1-2026.json" in names
-    assert not [n for n in names if n.endswith(".tmp")]
+
+    def fail(*args):
+        raise AssertionError("replayed the journal or reparsed the fixtures")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(sources, "_journal_events", fail)
+        patch.setattr(sources, "_load_raw_fixtures", fail)
+        sources.save_events(config)
+        sources.save_events(config)
+    assert sources.get_stored_events(config, 10) == [goal, card]
+
+    # A record appended behind the cursor's back is picked up by a replay.
+    sources.set_fixture_events(config, 10, [card])
+    journal = tmp_path / "events-1-2026.journal" / "10.jsonl"
+    with open(journal, "ab") as fp:
+        fp.write(b'{"add": [{"n": 1}]}\n')
+    sources.set_fixture_events(config, 10, [card, {"n": 1}, {"n": 2}])
+    records = [json.loads(line) for line in journal.read_text().splitlines()]
+    assert records[-1] == {"add": [{"n": 2}]}
+
+
+def test_event_reader_returns_only_new_events(tmp_path):
+    config = _events_config(tmp_path)
+    with open(tmp_path / "events-1-2026.json", "w") as fp:
+        json.dump({"10": [{"old": True}]}, fp)
+    reader = sources.EventReader(config)
+    # Before the fixture has a journal the pre-journal snapshot is read.
+    assert reader.read_new(10) == [{"old": True}]
+    assert reader.read_new(10) == []
+
+    sources.set_fixture_events(config, 10, [{"old": True}, {"n": 1}])
+    assert reader.read_new(10) == [{"n": 1}]
+    sources.set_fixture_events(config, 10, [{"old": True}, {"n": 1}, {"n": 2}])
+    # A half-written record is left for the next read.
+    journal = tmp_path / "events-1-2026.journal" / "10.jsonl"
+    with open(journal, "ab") as fp:
+        fp.write(b'{"add": [{"n"')
+    assert reader.read_new("10") == [{"n": 2}]
+    with open(journal, "ab") as fp:
+        fp.write(b": 3}]}\n")
+    assert reader.read_new(10) == [{"n": 3}]
+
+    # A journal replaced underneath is replayed without repeating events.
+    journal.unlink()
+    sources.set_fixture_events(config, 10, [{"n": 1}, {"n": 4}])
+    assert reader.read_new(10) == [{"n": 4}]
+
+
+def test_compact_events_drops_finished_fixtures(tmp_path, monkeypatch):
+    config = _events_config(tmp_path)
+    _write_raw_fixtures(
+        tmp_path,
+        [
+            _raw_fixture(10, "FT", "2026-06-11T12:00:00+00:00"),  # done -> drop
+            _raw_fixture(20, "FT", "2026-06-11T17:00:00+00:00"),  # in window -> keep
+            _raw_fixture(30, "1H", "2026-06-11T17:30:00+00:00"),  # live -> keep
+        ],
+    )
+    with open(tmp_path / "events-1-2026.json", "w") as fp:
+        json.dump({"10": [{"old": True}]}, fp)
+    for fid in (10, 20, 30, 40):  # 40 isn't a fixture any more -> drop
+        sources.set_fixture_events(config, fid, [make_event(player="P%s" % fid)])
+
+    sources.compact_events(config, FIXED_NOW)
+
+    assert set(sources.load_events(config)) == {"20", "30"}
+    assert not (tmp_path / "events-1-2026.json").exists()
 
 
 def test_get_data_file_uses_shared_dir_when_set():
@@ -979,10 +1752,14 @@ def _patch_updaters(monkeypatch):
     calls = []
     monkeypatch.setattr(commands.utils, "utcnow", lambda: FIXED_NOW)
     monkeypatch.setitem(
-        commands._RESOURCE_UPDATERS, "fixtures", lambda c: calls.append("fixtures")
+        commands._RESOURCE_UPDATERS,
+        "fixtures",
+        lambda c, max_calls: calls.append("fixtures"),
     )
     monkeypatch.setitem(
-        commands._RESOURCE_UPDATERS, "events", lambda c: calls.append("events")
+        commands._RESOURCE_UPDATERS,
+        "events",
+        lambda c, max_calls: calls.append("events"),
     )
     return commands, calls
 
@@ -991,7 +1768,8 @@ def test_update_all_runs_due_resources_and_records_state(tmp_path, monkeypatch):
     commands, calls = _patch_updaters(monkeypatch)
     cfg = _updater_config(tmp_path, {"fixtures": 15, "events": 3})
     commands.update_all(cfg)
-    assert calls == ["fixtures", "events"]
+    # Live events go first.
+    assert calls == ["events", "fixtures"]
     state = sources.load_update_state(cfg)
     assert set(state.keys()) == {"fixtures", "events"}
 
@@ -1006,6 +1784,24 @@ def test_update_all_throttles_each_resource_by_interval(tmp_path, monkeypatch):
     assert calls == ["events"]
 
 
+def test_update_all_burst_tightens_fixtures_without_live_feed(tmp_path, monkeypatch):
+    commands, calls = _patch_updaters(monkeypatch)
+    cfg = _updater_config(tmp_path, {"fixtures": 15, "events": 3})
+    _write_raw_fixtures(tmp_path, [_raw_fixture(2, "2H", "2026-06-11T16:10:00+00:00")])
+    intervals, _ = commands.plan_updates(cfg, FIXED_NOW)
+    burst = commands.BURST_MINUTES
+    assert intervals == {"fixtures": burst, "events": burst}
+    two_min_ago = (FIXED_NOW - datetime.timedelta(minutes=2)).isoformat()
+    sources.save_update_state(cfg, {"fixtures": two_min_ago, "events": two_min_ago})
+    commands.update_all(cfg, intervals)
+    assert calls == ["events", "fixtures"]
+
+    # The live feed carries the final score; fixtures keep their interval.
+    cfg["update_intervals"]["live_fixtures"] = 5
+    intervals, _ = commands.plan_updates(cfg, FIXED_NOW)
+    assert intervals == {"fixtures": 15, "live_fixtures": burst, "events": burst}
+
+
 def test_update_all_skips_unconfigured_resources(tmp_path, monkeypatch):
     commands, calls = _patch_updaters(monkeypatch)
     cfg = _updater_config(tmp_path, {"events": 3})
@@ -1013,6 +1809,110 @@ def test_update_all_skips_unconfigured_resources(tmp_path, monkeypatch):
     assert calls == ["events"]
 
 
+def test_quota_budget_refills_per_minute_and_resets_daily():
+    budget = quota.QuotaBudget(daily=10, per_minute=4)
+    assert budget.available(FIXED_NOW) == 4
+    budget.spend(4, FIXED_NOW)
+    assert budget.available(FIXED_NOW) == 0
+    # Half a minute refills half the bucket.
+    later = FIXED_NOW + datetime.timedelta(seconds=30)
+    assert budget.available(later) == 2
+    budget.spend(5, later)  # overdrawn by retries
+    restored = quota.QuotaBudget(10, 4, budget.to_state())
+    assert restored.available(later + datetime.timedelta(minutes=1)) == 1
+    next_day = FIXED_NOW + datetime.timedelta(days=1)
+    assert restored.available(next_day) == 4
+    assert restored.used == 0
+
+
+def test_update_all_spends_quota_on_events_first(tmp_path, monkeypatch):
+    commands, _ = _patch_updaters(monkeypatch)
+    budgets = []
+
+    def updater(name, calls):
+        def run(cfg, max_calls):
+            budgets.append((name, max_calls))
+            for _ in range(calls):
+                sources.API_STATS.record(name, 0.01)
+
+        return run
+
+    monkeypatch.setitem(commands._RESOURCE_UPDATERS, "fixtures", updater("f", 1))
+    monkeypatch.setitem(commands._RESOURCE_UPDATERS, "events", updater("e", 4))
+    cfg = _updater_config(tmp_path, {"fixtures": 1, "events": 1})
+    cfg["api_quota"] = {"daily": 6}
+    commands.update_all(cfg)
+    assert budgets == [("e", 6), ("f", 2)]
+    assert sources.load_update_state(cfg)["quota"]["used"] == 5
+
+    # One call left: events take it and fixtures wait for the next day.
+    monkeypatch.setattr(
+        commands.utils, "utcnow", lambda: FIXED_NOW + datetime.timedelta(minutes=1)
+    )
+    commands.update_all(cfg)
+    assert budgets[2:] == [("e", 1)]
+    state = sources.load_update_state(cfg)
+    assert state["fixtures"] == FIXED_NOW.isoformat()
+    assert state["quota"]["used"] == 9
+
+
+def test_save_events_respects_max_calls(tmp_path, monkeypatch):
+    config = _events_config(tmp_path)
+    monkeypatch.setattr(sources.utils, "utcnow", lambda: FIXED_NOW)
+    _write_raw_fixtures(tmp_path, [_raw_fixture(fid) for fid in (10, 20, 30)])
+    calls = []
+    monkeypatch.setattr(
+        sources, "get_fixture_events", lambda cfg, fid: calls.append(fid) or []
+    )
+    sources.save_events(config, max_calls=2)
+    assert len(calls) == 2 and set(calls) < {10, 20, 30}
+
+
+def test_plan_updates_follows_match_schedule(tmp_path):
+    from betbot import commands
+
+    cfg = _updater_config(tmp_path, {"fixtures": 15, "live_fixtures": 2, "events": 3})
+    kickoff = datetime.datetime(2026, 6, 11, 17, 0, tzinfo=pytz.utc)
+    _write_raw_fixtures(
+        tmp_path,
+        [
+            _raw_fixture(1, "FT", "2026-06-10T17:00:00+00:00"),
+            _raw_fixture(2, "NS", "2026-06-11T17:00:00+00:00"),
+        ],
+    )
+    minutes = datetime.timedelta(minutes=1)
+
+    # Between matchdays: no events, rare fixtures, wake up hourly.
+    now = kickoff - 10 * 60 * minutes
+    intervals, wake_at = commands.plan_updates(cfg, now)
+    assert intervals == {"fixtures": commands.IDLE_FIXTURES_MINUTES}
+    assert wake_at == now + commands.IDLE_WAKEUP
+    # The last idle sleep ends at kickoff.
+    now = kickoff - 20 * minutes
+    assert commands.plan_updates(cfg, now)[1] == kickoff
+
+    # In play: configured intervals, waking for the shortest one.
+    now = kickoff + 30 * minutes
+    intervals, wake_at = commands.plan_updates(cfg, now)
+    assert intervals == {"fixtures": 15, "live_fixtures": 2, "events": 3}
+    assert wake_at == now + 2 * minutes
+    # ... but not past the start of the final-whistle burst.
+    now = kickoff + 100 * minutes
+    burst_at = kickoff + commands.MATCH_EXPECTED_END - commands.FINISH_LEAD
+    assert commands.plan_updates(cfg, now)[1] == burst_at
+
+    # Near the expected end live data is polled every minute until finished;
+    # the full fixtures refresh keeps its own interval.
+    now = kickoff + 115 * minutes
+    intervals, wake_at = commands.plan_updates(cfg, now)
+    assert intervals == {"fixtures": 15, "live_fixtures": 1, "events": 1}
+    assert wake_at == now + minutes
+    _write_raw_fixtures(tmp_path, [_raw_fixture(2, "FT", "2026-06-11T17:00:00+00:00")])
+    assert commands.plan_updates(cfg, now)[0] == {
+        "fixtures": commands.IDLE_FIXTURES_MINUTES
+    }
+
+
 def test_send_match_event_group_id_override():
     # The /testEvents preview posts to the invoking chat, not the configured group.
     bot = FakeBot()
@@ -1047,3 +1947,281 @@ def test_set_fixture_events_round_trips_through_shared_file(tmp_path):
     sources.set_fixture_events(config, 100, events)
     assert sources.get_stored_events(config, 100) == events
     assert sources.get_stored_events(config, 50) == [{"type": "Goal"}]
+
+
+def test_change_watcher_wakes_on_published_change(tmp_path):
+    config = _events_config(tmp_path)
+    watcher = notify.ChangeWatcher(config)
+    try:
+        assert not watcher.wait(0.05)
+        threading.Timer(0.2, sources.publish_change, [config]).start()
+        assert watcher.wait(5)
+        assert notify.read_sequence(config) == 1
+        assert not watcher.wait(0.05)
+    finally:
+        watcher.close()
+
+
+def test_change_watcher_polls_without_inotify(tmp_path):
+    config = _events_config(tmp_path)
+    watcher = notify.ChangeWatcher(config, use_inotify=False)
+    sources.publish_change(config)
+    sources.publish_change(config)
+    assert watcher.wait(0.05)
+    assert notify.read_sequence(config) == 2
+
+
+def test_set_fixture_events_publishes_only_changes(tmp_path):
+    config = _events_config(tmp_path)
+    sources.set_fixture_events(config, 10, [make_event()])
+    sources.set_fixture_events(config, 10, [make_event()])
+    assert notify.read_sequence(config) == 1
+
+
+def test_event_key_is_stable_and_ignores_unrelated_fields():
+    event = make_event()
+    same = dict(make_event(), comments=None)
+    assert helpers.event_key(1, event) == helpers.event_key(1, same)
+    assert helpers.event_key(1, event) != helpers.event_key(2, event)
+    assert helpers.event_key(1, event) != helpers.event_key(1, make_event(elapsed=24))
+    # A corrected scorer keeps the slot.
+    corrected = make_event(player="Di Maria")
+    assert helpers.event_slot(event) == helpers.event_slot(corrected)
+
+
+def test_send_new_match_events_persists_and_handles_var_edits(tmp_path):
+    config, db = _fixtures_db(tmp_path, [_api_fixture(1)])
+    match = db.matches.getMatch(1)
+    bot = FakeBot()
+    goal = make_event(player="Messi", team_id=1)
+    card = make_event(ev_type="Card", detail="Red card", elapsed=40, team_id=2)
+    helpers.send_new_match_events(bot, db, config, match, [goal, card], [goal, card])
+    helpers.send_new_match_events(bot, db, config, match, [goal, card], [goal, card])
+    assert len(bot.sent) == 2
+
+    # A restarted bot (new Database) resumes from the stored keys: the
+    # corrected scorer replaces the posted goal, a second goal is posted.
+    db = database.Database(config)
+    fixed = make_event(player="Di Maria", team_id=1)
+    second = make_event(player="Messi", elapsed=80, team_id=1)
+    current = [fixed, card, second]
+    helpers.send_new_match_events(bot, db, config, match, current, current)
+    label = match.team(0).label()
+    assert [text for _, text in bot.sent][2:] == [f"⚽ 80': Messi - {label}"]
+    assert len(db.match_events.getEvents(1)) == 3
+    assert helpers.event_key(1, goal) not in db.match_events.getEvents(1)
+
+
+def test_first_start_seeds_posted_events_from_journal(tmp_path):
+    config, db = _fixtures_db(tmp_path, [_api_fixture(1)])
+    match = db.matches.getMatch(1)
+    goal = make_event(player="Messi", team_id=1)
+    card = make_event(ev_type="Card", detail="Red card", elapsed=40, team_id=2)
+    sources.set_fixture_events(config, 1, [goal, card])
+    reader = sources.EventReader(config)
+
+    # Deployed mid-match: the stored events went out from the previous bot.
+    assert helpers.seed_posted_events(db, reader, [match])
+    second = make_event(player="Messi", elapsed=80, team_id=1)
+    sources.set_fixture_events(config, 1, [goal, card, second])
+    bot = FakeBot()
+    helpers.send_new_match_events(
+        bot, db, config, match, reader.read_new(1), reader.current(1)
+    )
+    label = match.team(0).label()
+    assert [text for _, text in bot.sent] == [f"⚽ 80': Messi - {label}"]
+
+    # Later starts resume from the table instead.
+    db = database.Database(config)
+    assert not helpers.seed_posted_events(db, sources.EventReader(config), [match])
+    assert len(db.match_events.getEvents(1)) == 3
+
+
+def test_match_scheduler_fires_timers_once_and_follows_reschedules(tmp_path):
+    fixtures = [_api_fixture(1), _api_fixture(2, 3, 4), _api_fixture(3, 5, 6)]
+    _config, db = _fixtures_db(tmp_path, fixtures)
+    timers = scheduler.MatchScheduler(
+        {
+            "kickoff": datetime.timedelta(0),
+            "remind": datetime.timedelta(minutes=30),
+            "remind_day": datetime.timedelta(hours=24),
+        }
+    )
+
+    def at(day, hour, minute=0):
+        return pytz.utc.localize(datetime.datetime(2026, 6, day, hour, minute))
+
+    # Match 1's reminders were due before the bot started: skipped.
+    timers.plan(db.matches, at(11, 16, 50))
+    assert timers.next_time() == at(11, 17)
+    assert timers.pop_due(at(11, 16, 59)) == []
+    assert timers.pop_due(at(11, 17)) == [("kickoff", 1), ("remind_day", 2)]
+
+    # Match 3 moves to today: of its overdue reminders only the last one,
+    # whose window is still open, fires; timers that fired already don't
+    # come back.
+    fixtures[2]["fixture"]["date"] = "2026-06-11T17:10:00+00:00"
+    _write_raw_fixtures(tmp_path, fixtures)
+    assert db.reload_data() == {3}
+    timers.plan(db.matches, at(11, 17, 5))
+    assert timers.pop_due(at(11, 17, 5)) == [("remind", 3)]
+    assert timers.next_time() == at(11, 17, 10)
+
+    # A match added 20 minutes ahead gets the 30-minute reminder only; one
+    # added 20 hours ahead its day reminder at once and the other in time.
+    fixtures.append(_api_fixture(4, 7, 8))
+    fixtures[3]["fixture"]["date"] = "2026-06-11T17:25:00+00:00"
+    fixtures.append(_api_fixture(5, 9, 10))
+    fixtures[4]["fixture"]["date"] = "2026-06-12T13:05:00+00:00"
+    _write_raw_fixtures(tmp_path, fixtures)
+    assert db.reload_data() == {4, 5}
+    timers.plan(db.matches, at(11, 17, 5))
+    assert timers.pop_due(at(11, 17, 5)) == [("remind_day", 5), ("remind", 4)]
+    assert timers.pop_due(at(12, 12, 35)) == [
+        ("kickoff", 3),
+        ("kickoff", 4),
+        ("remind", 5),
+    ]
+
+
+def test_outbox_sends_by_priority_and_spaces_each_chat(monkeypatch):
+    monkeypatch.setattr(outbox, "GLOBAL_INTERVAL", 0)
+    monkeypatch.setattr(outbox, "GROUP_CHAT_INTERVAL", 0.2)
+    bot = FakeBot()
+    box = outbox.Outbox(bot, workers=1)
+    box.sender(outbox.REMINDERS).send_message(5, "remind")
+    box.send_message(-1, "table", priority=outbox.SCORES)
+    box.sender(outbox.EVENTS).send_message(-1, "goal")
+    box.sender(outbox.EVENTS).send_message(-1, "card")
+    box.start()
+    assert box.join(timeout=5)
+    # Events first, in order; the group's second message waits out its
+    # interval while the private reminder goes ahead.
+    assert [text for _, text in bot.sent] == ["goal", "remind", "card", "table"]
+
+
+def test_outbox_retries_after_flood_limit():
+    class FloodedBot(FakeBot):
+        def send_message(self, group_id, text, **kwargs):
+            if not self.sent:
+                self.sent.append((group_id, None))
+                raise telebot.apihelper.ApiTelegramException(
+                    "sendMessage",
+                    None,
+                    {
+                        "error_code": 429,
+                        "description": "Too Many Requests",
+                        "parameters": {"retry_after": 0.1},
+                    },
+                )
+            super().send_message(group_id, text, **kwargs)
+
+    bot = FloodedBot()
+    box = outbox.Outbox(bot, workers=1).start()
+    box.send_message(7, "hello", parse_mode="Markdown")
+    assert box.join(timeout=5)
+    assert bot.sent == [(7, None), (7, "hello")]
+
+
+def _webhook_update(update_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1781197200,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Ann"},
+            "text": text,
+            "entities": [{"offset": 0, "length": len(text), "type": "bot_command"}],
+        },
+    }
+
+
+def _post_update(server, path, update):
+    request = urllib.request.Request(
+        "http://127.0.0.1:%d%s" % (server.port, path),
+        data=json.dumps(update).encode(),
+    )
+    try:
+        return urllib.request.urlopen(request, timeout=5).status
+    except urllib.error.HTTPError as err:
+        return err.code
+
+
+def test_webhook_server_dispatches_posted_updates(caplog):
+    # Built like the production bot, i.e. threaded.
+    tb = telebot.TeleBot("1:token")
+    seen = []
+
+    @tb.message_handler(commands=["ping"])
+    def ping(message):
+        seen.append((message.text, threading.current_thread().name))
+
+    @tb.message_handler(commands=["boom"])
+    def boom(message):
+        raise RuntimeError("boom")
+
+    registered = []
+    tb.set_webhook = lambda **kwargs: registered.append(kwargs)
+    config = {
+        "webhook": {
+            "url": "https://bet.example.com/telegram/",
+            "listen": "127.0.0.1",
+            "port": 0,
+            "secret_token": "s3cret",
+            "workers": 2,
+        }
+    }
+    server = webhook.from_config(tb, config).start()
+    assert registered == [{"url": "https://bet.example.com/telegram/s3cret"}]
+    try:
+        ok, failing = _webhook_update(3, "/ping"), _webhook_update(4, "/boom")
+        assert _post_update(server, "/telegram/wrong", ok) == 404
+        assert _post_update(server, "/telegram", ok) == 404
+        assert _post_update(server, "/telegram/s3cret", ok) == 200
+        assert _post_update(server, "/telegram/s3cret", failing) == 200
+        server.updates.join()
+    finally:
+        server.stop()
+    # Handlers run on the receiver's own workers, which see their errors.
+    assert [text for text, _ in seen] == ["/ping"]
+    assert seen[0][1].startswith("webhook_")
+    assert "Error handling update 4" in caplog.text
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_webhook_server_rejects_bad_content_length(length):
+    server = webhook.WebhookServer(telebot.TeleBot("1:token"), "s3cret").start()
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    try:
+        conn.request(
+            "POST", "/telegram/s3cret", body=b"{}", headers={"Content-Length": length}
+        )
+        assert conn.getresponse().status == 400
+    finally:
+        conn.close()
+        server.stop()
+    assert server.updates.empty()
+
+
+def test_webhook_server_answers_503_when_its_queue_is_full():
+    tb = telebot.TeleBot("1:token")
+    started, release = threading.Event(), threading.Event()
+
+    @tb.message_handler(commands=["slow"])
+    def slow(message):
+        started.set()
+        release.wait(5)
+
+    server = webhook.WebhookServer(tb, "s3cret", workers=1, queue_size=1).start()
+    path = "/telegram/s3cret"
+    try:
+        assert _post_update(server, path, _webhook_update(1, "/slow")) == 200
+        assert started.wait(5)
+        assert _post_update(server, path, _webhook_update(2, "/slow")) == 200
+        assert _post_update(server, path, _webhook_update(3, "/slow")) == 503
+        release.set()
+        server.updates.join()
+    finally:
+        release.set()
+        server.stop()